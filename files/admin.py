@@ -1,7 +1,7 @@
 # admin.py
 
 from django.contrib import admin
-from .models import File, Folder
+from .models import Blob, ExportJob, File, Folder
 
 class FileAdmin(admin.ModelAdmin):
     list_display = ('name', 'uploaded_by', 'upload_date', 'size_formatted')
@@ -25,15 +25,32 @@ class FileAdmin(admin.ModelAdmin):
 
 # Register Folder with optional customization
 class FolderAdmin(admin.ModelAdmin):
-    list_display = ('name', 'parent', 'created_by', 'created_at')
+    list_display = ('name', 'parent', 'created_by', 'created_at', 'total_files', 'total_size_formatted', 'last_modified')
     list_filter = ('created_at', 'created_by')
     search_fields = ('name', 'created_by__username')
-    readonly_fields = ('created_at', 'created_by')
+    readonly_fields = ('created_at', 'created_by', 'total_files', 'total_size', 'last_modified')
+
+    def total_size_formatted(self, obj):
+        return f"{obj.total_size / 1024:.2f} KB"
+    total_size_formatted.short_description = 'Total size'
 
     def save_model(self, request, obj, form, change):
         if not obj.pk:
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'ref_count', 'created_at')
+    search_fields = ('sha256',)
+    readonly_fields = ('sha256', 'file', 'size', 'ref_count', 'created_at')
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'requested_by', 'status', 'size', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('name', 'requested_by__username', 'cache_key')
+    readonly_fields = ('requested_by', 'manifest', 'cache_key', 'archive', 'size', 'error', 'created_at', 'updated_at')
+
 admin.site.register(File, FileAdmin)
 admin.site.register(Folder, FolderAdmin)
+admin.site.register(Blob, BlobAdmin)
+admin.site.register(ExportJob, ExportJobAdmin)
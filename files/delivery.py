@@ -0,0 +1,154 @@
+"""HTTP helpers for serving stored files: validators, conditional GET, byte ranges and offloading."""
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils.http import http_date, parse_http_date_safe
+
+# Size of the reads from storage while streaming a file or a byte range
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """The Range header cannot be served (out of bounds or several ranges)."""
+
+
+def content_disposition(filename, as_attachment):
+    """Content-Disposition with an RFC 5987 ``filename*`` so non-ASCII names survive."""
+    disposition_type = 'attachment' if as_attachment else 'inline'
+    filename_ascii = (filename.encode('ascii', 'ignore') or b'file').decode().replace('"', '')
+    return f"{disposition_type}; filename=\"{filename_ascii}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def file_etag(file_obj):
+    """Strong ETag from the stored content hash, or a weak one for legacy rows without it."""
+    if file_obj.sha256:
+        return f'"{file_obj.sha256}"'
+    return f'W/"{file_obj.pk}-{file_obj.size}-{int(file_obj.upload_date.timestamp())}"'
+
+
+def file_last_modified(file_obj):
+    """Last-Modified timestamp (seconds); stored content never changes after upload."""
+    return int(file_obj.upload_date.timestamp())
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def if_range_matches(request, etag, last_modified):
+    """True when there is no If-Range header or it still matches the current representation."""
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    value = value.strip()
+    if value.startswith('"') or value.startswith('W/'):
+        # If-Range requires a strong comparison
+        return not etag.startswith('W/') and value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def parse_range(header, size):
+    """Parse a ``Range`` header into an inclusive ``(start, end)`` tuple.
+
+    Returns None when the whole file should be sent (no header, another unit or
+    a malformed value, which RFC 9110 says to ignore). Raises RangeNotSatisfiable
+    for ranges outside the file and for multi-range requests, which we do not
+    serve as multipart/byteranges.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    if ',' in spec:
+        raise RangeNotSatisfiable('Multiple ranges are not supported')
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first == '':
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable('Empty suffix range')
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable('Range starts after the end of the file')
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def iter_file_range(field_file, start, end, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Yield bytes ``start``..``end`` (inclusive) of a stored file.
+
+    Storages that can fetch a byte range themselves (``iter_range``) only
+    transfer the requested bytes; others are opened and seeked.
+    """
+    storage = field_file.storage
+    if hasattr(storage, 'iter_range'):
+        yield from storage.iter_range(field_file.name, start, end, chunk_size)
+        return
+    with storage.open(field_file.name, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def offload_response(field_file, filename, content_type, as_attachment):
+    """Build a response that lets something other than the worker send the bytes.
+
+    Depends on ``FILES_DOWNLOAD_MODE``; returns None when the bytes should be
+    proxied through the worker (the default, or when the storage does not
+    support the configured mode).
+    """
+    mode = getattr(settings, 'FILES_DOWNLOAD_MODE', 'proxy')
+    storage = field_file.storage
+    disposition = content_disposition(filename, as_attachment)
+
+    if mode == 'redirect' and hasattr(storage, 'presigned_url'):
+        # Objects are shared blobs whose stored Content-Disposition carries the
+        # first uploader's filename; only a signed override gives this row's name
+        mode = 'presigned'
+
+    if mode == 'presigned' and hasattr(storage, 'presigned_url'):
+        # The bucket answers with our Content-Type/Content-Disposition because
+        # they are signed into the URL as response overrides
+        return HttpResponseRedirect(storage.presigned_url(
+            field_file.name,
+            expire=getattr(settings, 'FILES_DOWNLOAD_URL_EXPIRE', 300),
+            response_headers={
+                'ResponseContentType': content_type,
+                'ResponseContentDisposition': disposition,
+            },
+        ))
+
+    if mode in ('accel', 'sendfile'):
+        try:
+            path = storage.path(field_file.name)
+        except NotImplementedError:
+            # Remote storage: there is no local file for the web server to send
+            return None
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = disposition
+        if mode == 'accel':
+            prefix = getattr(settings, 'FILES_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name.lstrip('/'))
+        else:
+            response['X-Sendfile'] = path
+        return response
+
+    return None
@@ -0,0 +1,131 @@
+"""Background ZIP exports of arbitrary file/folder selections, cached by content."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExportJob, File, Folder, StoragePurge
+from .zipstream import iter_zip
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_entries(file_ids, folder_ids):
+    """``[(arcname, File)]`` for the selection, sorted by arcname.
+
+    Selected files go at the top of the archive and every selected folder
+    becomes a directory holding its whole subtree. The query count does not
+    depend on the size of the selection.
+    """
+    folders = list(Folder.objects.filter(pk__in=folder_ids))
+    entries = []
+    if folders:
+        subtrees, files_in_subtrees = Q(), Q()
+        for folder in folders:
+            subtrees |= Q(path__startswith=folder.path)
+            files_in_subtrees |= Q(folder__path__startswith=folder.path)
+        names = dict(Folder.objects.filter(subtrees).values_list('id', 'name'))
+        for file_obj in File.objects.filter(files_in_subtrees).select_related('folder'):
+            # The outermost selected folder containing the file is its top directory
+            top = min((f for f in folders if file_obj.folder.path.startswith(f.path)), key=lambda f: f.depth)
+            below = file_obj.folder.path[len(top.path):].strip('/')
+            ids = [top.pk] + ([int(pk) for pk in below.split('/')] if below else [])
+            entries.append((os.path.join(*[names[pk] for pk in ids], file_obj.name), file_obj))
+    for file_obj in File.objects.filter(pk__in=file_ids):
+        entries.append((file_obj.name, file_obj))
+
+    # Same file selected twice (directly and through a folder) only goes in once;
+    # clashing names get a numeric suffix
+    seen_files, seen_names, unique = set(), set(), []
+    for arcname, file_obj in sorted(entries, key=lambda entry: (entry[0], entry[1].pk)):
+        if file_obj.pk in seen_files:
+            continue
+        seen_files.add(file_obj.pk)
+        base, ext = os.path.splitext(arcname)
+        counter = 1
+        while arcname in seen_names:
+            arcname = f'{base} ({counter}){ext}'
+            counter += 1
+        seen_names.add(arcname)
+        unique.append((arcname, file_obj))
+    return unique
+
+
+def manifest_key(entries):
+    """Hash of the archive's names and contents; equal keys mean byte-identical archives."""
+    manifest = [
+        # Rows without a hash are identified by their (never overwritten) storage name
+        [arcname, file_obj.sha256 or f'{file_obj.file.name}:{file_obj.size}', file_obj.upload_date.isoformat()]
+        for arcname, file_obj in entries
+    ]
+    # The compression level changes the archive bytes too
+    manifest.append(getattr(settings, 'FILES_ZIP_COMPRESSLEVEL', 6))
+    return hashlib.sha256(json.dumps(manifest).encode()).hexdigest()
+
+
+def build_export(job_id):
+    """Build the archive of a pending job, reusing a cached archive with the same key."""
+    # update() skips auto_now: set updated_at so process_export_jobs can tell
+    # when the build started
+    claimed = ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', updated_at=timezone.now())
+    if not claimed:
+        return
+    job = ExportJob.objects.get(pk=job_id)
+    try:
+        cached = (
+            ExportJob.objects.filter(cache_key=job.cache_key, status='ready')
+            .exclude(archive='').exclude(pk=job.pk).order_by('-created_at').first()
+        )
+        if cached and cached.archive.storage.exists(cached.archive.name):
+            job.archive, job.size = cached.archive.name, cached.size
+        else:
+            files = File.all_objects.in_bulk([file_id for _, file_id in job.manifest])
+            entries = (
+                (arcname, partial(files[file_id].file.open, 'rb'), files[file_id].size,
+                 files[file_id].upload_date.timetuple()[:6], files[file_id].content_type)
+                for arcname, file_id in job.manifest if file_id in files
+            )
+            # Spool to local disk, then hand the finished archive to storage in one upload
+            with tempfile.TemporaryFile() as spool:
+                for chunk in iter_zip(entries):
+                    spool.write(chunk)
+                job.size = spool.tell()
+                spool.seek(0)
+                job.archive.save(f'{job.cache_key}.zip', DjangoFile(spool, name=f'{job.cache_key}.zip'), save=False)
+        ready = ExportJob.objects.filter(pk=job_id).update(
+            archive=job.archive.name, size=job.size, status='ready', updated_at=timezone.now())
+        if not ready:
+            # The job was deleted while its archive was being built
+            release_archives([job.archive.name])
+    except Exception as e:
+        logger.exception('Export %s failed', job_id)
+        ExportJob.objects.filter(pk=job_id).update(status='failed', error=str(e))
+
+
+def release_archives(names, background=True):
+    """Queue the archives no remaining job uses for deletion; returns how many were queued.
+
+    Archives are shared by every job with the same content, so deleting a job
+    only frees its archive once the last of them is gone.
+    """
+    names = set(names) - {''}
+    names -= set(ExportJob.objects.filter(archive__in=names).values_list('archive', flat=True))
+    return StoragePurge.objects.queue(names, background=background)
+
+
+def build_pending(limit=None):
+    """Build jobs left pending (e.g. by a restart); returns how many were processed."""
+    pending = ExportJob.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True)
+    processed = 0
+    for job_id in list(pending[:limit] if limit else pending):
+        build_export(job_id)
+        processed += 1
+    return processed
@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from files.models import File
+from files.uploadhandlers import describe_content
+
+
+class Command(BaseCommand):
+    help = 'Fill in content type, hashes and original filename for files uploaded before they were recorded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Rows written per UPDATE batch (default 200)')
+
+    def handle(self, *args, **options):
+        missing = File.all_objects.filter(
+            Q(content_type='') | Q(etag='') | Q(sha256='') | Q(original_filename='')
+        ).exclude(file='').order_by('id')
+
+        fields = ['content_type', 'etag', 'sha256', 'original_filename']
+        batch, updated, failed = [], 0, 0
+        for file_obj in missing.iterator(chunk_size=options['batch_size']):
+            try:
+                # One streaming read of the stored object gives every value
+                with file_obj.file.open('rb') as handle:
+                    sha256, md5, content_type = describe_content(handle, file_obj.file.name)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Could not read file {file_obj.id}: {e}'))
+                continue
+            file_obj.sha256 = file_obj.sha256 or sha256
+            file_obj.etag = file_obj.etag or md5
+            file_obj.content_type = file_obj.content_type or content_type
+            file_obj.original_filename = file_obj.original_filename or os.path.basename(file_obj.name)
+            batch.append(file_obj)
+            if len(batch) >= options['batch_size']:
+                File.all_objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+        if batch:
+            File.all_objects.bulk_update(batch, fields)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} file(s), {failed} could not be read'))
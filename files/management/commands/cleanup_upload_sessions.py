@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from files.models import File, UploadSession
+from files.uploads import get_upload_backend
+
+
+class Command(BaseCommand):
+    help = 'Abort resumable upload sessions that have not received a chunk for a while'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=int, default=24,
+                            help='Abort active sessions idle for longer than this (default 24)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['older_than_hours'])
+        backend = get_upload_backend(File.file.field.storage)
+        aborted = 0
+        for session in UploadSession.objects.filter(status='active', updated_at__lt=cutoff).iterator():
+            try:
+                backend.abort(session)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'Failed to abort upload {session.pk}: {e}'))
+                continue
+            session.status = 'aborted'
+            session.save(update_fields=['status', 'updated_at'])
+            aborted += 1
+
+        # Finished sessions are only kept for resumability; drop old ones
+        deleted, _ = UploadSession.objects.filter(
+            ~Q(status='active'), updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Aborted {aborted} stale upload(s), removed {deleted} finished session(s)'))
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from files.exports import build_pending, release_archives
+from files.models import ExportJob
+from files.purge import purge_pending
+
+
+class Command(BaseCommand):
+    help = 'Build export archives left pending and remove expired export jobs and their archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expire-hours', type=int, default=7 * 24,
+                            help='Delete export jobs older than this (default 168)')
+        parser.add_argument('--stale-minutes', type=int, default=60,
+                            help='Requeue jobs stuck running for longer than this (default 60)')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # A worker that died mid-build leaves its job running forever
+        requeued = ExportJob.objects.filter(
+            status='running', updated_at__lt=now - timedelta(minutes=options['stale_minutes'])
+        ).update(status='pending')
+        built = build_pending()
+
+        expired = ExportJob.objects.filter(created_at__lt=now - timedelta(hours=options['expire_hours']))
+        names = set(expired.exclude(archive='').values_list('archive', flat=True))
+        deleted, _ = expired.delete()
+        purged = purge_pending() if release_archives(names, background=False) else 0
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Requeued {requeued}, built {built} export(s); removed {deleted} expired job(s) and {purged} archive(s)'))
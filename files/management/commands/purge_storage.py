@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from files.models import StoragePurge
+from files.purge import MAX_ATTEMPTS, PURGE_BATCH_SIZE, purge_pending
+
+
+class Command(BaseCommand):
+    help = 'Delete stored objects queued for purging (left over by deleted files and folders)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help='Skip objects that already failed this many times')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Reset the attempt counter of objects that failed before')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            StoragePurge.objects.filter(attempts__gt=0).update(attempts=0)
+        purged = purge_pending(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+        remaining = StoragePurge.objects.count()
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} object(s); {remaining} still queued'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from files.purge import purge_pending
+from files.trash import TRASH_BATCH_SIZE, purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Permanently delete files and folders that have been in the trash past the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Override FILES_TRASH_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=TRASH_BATCH_SIZE,
+                            help='Rows deleted per transaction')
+
+    def handle(self, *args, **options):
+        files, folders = purge_expired(options['retention_days'], options['batch_size'])
+        # The stored objects of the deleted files were queued; clear them now
+        purged = purge_pending() if files else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {files} file(s) and {folders} folder(s) from the trash; purged {purged} stored object(s)'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from files.models import File, Folder
+from files.rollups import rebuild_rollups
+from files.tree import invalidate_folder_tree
+
+
+class Command(BaseCommand):
+    help = 'Recompute the folder size, file count and last-modified rollups from the File table'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = rebuild_rollups(Folder, File)
+            invalidate_folder_tree()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups, {changed} folder(s) corrected'))
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from files.models import Blob, ExportJob, File, StoragePurge
+from files.purge import purge_pending
+from files.reconcile import DANGLING, ORPHAN, reconcile
+
+BATCH_SIZE = 1000
+# Where uploaded documents, their blobs and thumbnails, and export archives are stored
+DEFAULT_PREFIXES = ['hr_documents/', 'exports/']
+
+
+class Command(BaseCommand):
+    help = 'Compare stored objects with File/Blob rows and report (or clean up) the differences'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', action='append', dest='prefixes',
+                            help='Only look at stored names under this prefix; may be repeated '
+                                 '(default hr_documents/ and exports/)')
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Delete stored objects no row references, and blobs no file uses')
+        parser.add_argument('--delete-dangling', action='store_true',
+                            help='Delete File rows whose stored object is missing')
+        parser.add_argument('--min-age-hours', type=int, default=24,
+                            help='Leave objects younger than this alone; they may belong to an upload in flight (default 24)')
+
+    def handle(self, *args, **options):
+        storage = File.file.field.storage
+        cutoff = timezone.now() - timedelta(hours=options['min_age_hours'])
+        verbose = options['verbosity'] >= 2
+        counts = {'matched': 0, ORPHAN: 0, DANGLING: 0, 'recent': 0}
+        orphans, dangling = [], []
+
+        for status, name, size, last_modified in self._reconcile(storage, options['prefixes'] or DEFAULT_PREFIXES):
+            if status == ORPHAN and last_modified and last_modified > cutoff:
+                counts['recent'] += 1
+                continue
+            counts[status] += 1
+            if status == ORPHAN:
+                if verbose:
+                    self.stdout.write(f'orphan: {name} ({size} bytes)')
+                if options['delete_orphans']:
+                    orphans.append(name)
+                    if len(orphans) >= BATCH_SIZE:
+                        self._queue_orphans(orphans)
+                        orphans = []
+            elif status == DANGLING:
+                if verbose:
+                    self.stdout.write(f'dangling: {name}')
+                if options['delete_dangling']:
+                    dangling.append(name)
+                    if len(dangling) >= BATCH_SIZE:
+                        self._delete_dangling(dangling)
+                        dangling = []
+
+        if orphans:
+            self._queue_orphans(orphans)
+        if dangling:
+            self._delete_dangling(dangling)
+
+        # Blobs left behind without any file (e.g. an interrupted upload)
+        unused = Blob.objects.filter(files__isnull=True, created_at__lt=cutoff)
+        unused_count = unused.count()
+        if options['delete_orphans'] and unused_count:
+            names = list(unused.values_list('file', flat=True))
+            unused.delete()
+            self._queue_orphans(names)
+
+        purged = purge_pending() if options['delete_orphans'] else 0
+
+        self.stdout.write(
+            f"{counts['matched']} matched, {counts[ORPHAN]} orphaned object(s), "
+            f"{counts[DANGLING]} dangling row reference(s), {unused_count} unused blob(s), "
+            f"{counts['recent']} recent object(s) skipped"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {purged} object(s)' if options['delete_orphans'] else 'Reconciliation complete'))
+
+    def _reconcile(self, storage, prefixes):
+        for prefix in prefixes:
+            yield from reconcile(storage, prefix)
+
+    def _queue_orphans(self, names):
+        # Queued without starting a background thread: purge_pending runs
+        # synchronously at the end of the command
+        queued = set(StoragePurge.objects.filter(name__in=names).values_list('name', flat=True))
+        StoragePurge.objects.bulk_create([StoragePurge(name=name) for name in names if name not in queued])
+
+    def _delete_dangling(self, names):
+        deleted, _ = File.all_objects.filter(file__in=names).delete()
+        # Blobs with files are released by the File deletion above
+        Blob.objects.filter(file__in=names, files__isnull=True).delete()
+        # An export whose archive is gone cannot be downloaded any more
+        deleted += ExportJob.objects.filter(archive__in=names).delete()[0]
+        self.stdout.write(self.style.WARNING(f'Deleted {deleted} row(s) with missing objects'))
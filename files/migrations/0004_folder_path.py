@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-17 14:48
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    Folder = apps.get_model('files', 'Folder')
+    folders = list(Folder.objects.only('id', 'parent_id'))
+    children = {}
+    for folder in folders:
+        children.setdefault(folder.parent_id, []).append(folder)
+
+    # Walk the tree from the roots so every parent gets its path before its children
+    queue = [(folder, '/', 0) for folder in children.get(None, [])]
+    while queue:
+        folder, parent_path, depth = queue.pop()
+        folder.path = f"{parent_path}{folder.id}/"
+        folder.depth = depth
+        queue.extend((child, folder.path, depth + 1) for child in children.get(folder.id, []))
+    Folder.objects.bulk_update(folders, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0003_alter_folder_created_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0004_folder_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='sha256',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-17 14:59
+
+from django.db import migrations, models
+
+from files.rollups import rebuild_rollups
+
+
+def build_rollups(apps, schema_editor):
+    rebuild_rollups(apps.get_model('files', 'Folder'), apps.get_model('files', 'File'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0008_storagepurge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='last_modified',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='total_files',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='total_size',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0009_folder_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['folder', '-upload_date', '-id'], name='file_folder_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['-upload_date', '-id'], name='file_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['parent', '-created_at', '-id'], name='folder_parent_created_idx'),
+        ),
+    ]
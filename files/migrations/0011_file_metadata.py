@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0010_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='content_type',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='etag',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='original_filename',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='content_type',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -1,17 +1,473 @@
-from django.db import models
+import os
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from hr_intranet.background import run_in_background
+
+from .thumbnails import can_thumbnail, derivative_names, generate_many
+from .tree import invalidate_folder_tree
+from .uploadhandlers import content_sha256, describe_content
 
 User = get_user_model()
 
+
+class FolderQuerySet(models.QuerySet):
+    def delete(self):
+        # Delete the files of every subtree through FileQuerySet.delete so their
+        # blobs are released, then let the folders cascade
+        with transaction.atomic():
+            subtrees = Q()
+            for path in self.values_list('path', flat=True):
+                subtrees |= Q(folder__path__startswith=path)
+            if subtrees:
+                File.all_objects.filter(subtrees).delete()
+            invalidate_folder_tree()
+            return super().delete()
+
+    def update_rollups(self, changes):
+        """Apply ``(folder_id, files_delta, size_delta)`` changes to each folder and its ancestors."""
+        changes = [(int(folder_id), files, size) for folder_id, files, size in changes if folder_id]
+        if not changes:
+            return
+        paths = dict(Folder.all_objects.filter(pk__in={change[0] for change in changes}).values_list('id', 'path'))
+        deltas = defaultdict(lambda: [0, 0])
+        for folder_id, files_delta, size_delta in changes:
+            for pk in paths.get(folder_id, '').strip('/').split('/'):
+                if pk:
+                    deltas[int(pk)][0] += files_delta
+                    deltas[int(pk)][1] += size_delta
+        Folder.all_objects.add_to_totals(deltas)
+
+    def add_to_totals(self, deltas):
+        """Add ``{folder_id: (files_delta, size_delta)}`` to exactly those folders."""
+        # One UPDATE per distinct delta: an upload batch into one folder touches
+        # the whole ancestor chain with a single statement
+        now = timezone.now()
+        grouped = defaultdict(list)
+        for pk, delta in deltas.items():
+            if any(delta):
+                grouped[tuple(delta)].append(pk)
+        for (files_delta, size_delta), pks in grouped.items():
+            Folder.all_objects.filter(pk__in=pks).update(
+                total_files=F('total_files') + files_delta,
+                total_size=F('total_size') + size_delta,
+                last_modified=now,
+            )
+
+
+class LiveFolderManager(models.Manager.from_queryset(FolderQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Folder(models.Model):
     name = models.CharField(max_length=255)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)  # Allow null/blank
     created_at = models.DateTimeField(auto_now_add=True)
-    
+    # Materialized path of ancestor ids including this folder, e.g. "/1/5/9/".
+    # Lets "all descendants" and "all ancestors" be answered with one indexed query.
+    path = models.CharField(max_length=1024, db_index=True, editable=False, default='')
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    # Rollups over the folder and all its subfolders, maintained incrementally
+    # by File/Folder writes (rebuild with the rebuild_folder_rollups command)
+    total_size = models.BigIntegerField(default=0, editable=False)
+    total_files = models.BigIntegerField(default=0, editable=False)
+    last_modified = models.DateTimeField(null=True, blank=True, editable=False)
+    # Set when the folder is in the trash; hidden from ``objects`` until purged
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+
+    objects = LiveFolderManager()
+    all_objects = FolderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Cursor pagination of folder listings (see hr_intranet.pagination)
+            models.Index(fields=['parent', '-created_at', '-id'], name='folder_parent_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        parent_path = self.parent.path if self.parent_id else '/'
+        if self.pk and self.path and parent_path.startswith(self.path):
+            raise ValueError("A folder cannot be moved into itself or one of its subfolders")
+        super().save(*args, **kwargs)
+        invalidate_folder_tree()
+
+        new_path = f"{parent_path}{self.pk}/"
+        if new_path == self.path:
+            return
+        new_depth = new_path.count('/') - 2
+        if self.path:
+            # Moved: rewrite the path prefix of the whole subtree in one statement
+            Folder.all_objects.filter(path__startswith=self.path).update(
+                path=Concat(Value(new_path), Substr('path', len(self.path) + 1)),
+                depth=F('depth') + (new_depth - self.depth),
+            )
+            # and carry the subtree totals from the old ancestors to the new ones
+            totals = Folder.all_objects.filter(pk=self.pk).values_list('total_files', 'total_size').get()
+            deltas = defaultdict(lambda: [0, 0])
+            for pk in self.ancestor_ids:
+                deltas[pk][0] -= totals[0]
+                deltas[pk][1] -= totals[1]
+            for pk in new_path.strip('/').split('/')[:-1]:
+                deltas[int(pk)][0] += totals[0]
+                deltas[int(pk)][1] += totals[1]
+            Folder.all_objects.add_to_totals(deltas)
+        else:
+            Folder.all_objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        self.path = new_path
+        self.depth = new_depth
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            File.all_objects.filter(folder__path__startswith=self.path).delete()
+            invalidate_folder_tree()
+            return super().delete(*args, **kwargs)
+
+    def copy_to(self, parent, user, name=None):
+        """Copy the folder and its live subtree under ``parent``; returns the new folder.
+
+        No content is copied: the new File rows reference the same stored
+        objects (see File.copy_to). Folders are created one level at a time, so
+        the number of queries grows with the depth of the tree, not its size.
+        """
+        parent_path = parent.path if parent else '/'
+        if parent_path.startswith(self.path):
+            raise ValueError("A folder cannot be copied into itself or one of its subfolders")
+        now = timezone.now()
+        with transaction.atomic():
+            sources = list(self.get_descendants(include_self=True).order_by('depth', 'pk'))
+            copies = {}
+            for depth in sorted({folder.depth for folder in sources}):
+                level = [folder for folder in sources if folder.depth == depth]
+                created = Folder.objects.bulk_create([
+                    Folder(
+                        name=(name or folder.name) if folder.pk == self.pk else folder.name,
+                        parent=parent if folder.pk == self.pk else copies[folder.parent_id],
+                        created_by=user,
+                        # Same content as the source, so the same rollups
+                        total_files=folder.total_files,
+                        total_size=folder.total_size,
+                        last_modified=now,
+                    )
+                    for folder in level
+                ])
+                for source, copy in zip(level, created):
+                    copy.path = f"{copy.parent.path if copy.parent else '/'}{copy.pk}/"
+                    copy.depth = copy.path.count('/') - 2
+                    copies[source.pk] = copy
+                Folder.objects.bulk_update(created, ['path', 'depth'])
+
+            files = File.objects.filter(folder__path__startswith=self.path).order_by('pk')
+            File.objects.bulk_create([file_obj.copy(folder=copies[file_obj.folder_id], user=user) for file_obj in files])
+            Blob.objects.reference(files.exclude(blob__isnull=True).values_list('blob_id', flat=True))
+
+            root = copies[self.pk]
+            Folder.objects.add_to_totals({
+                int(pk): (root.total_files, root.total_size) for pk in parent_path.strip('/').split('/') if pk})
+            invalidate_folder_tree()
+        return root
+
+    def trash(self):
+        """Soft-delete the folder with its whole subtree; returns ``(folders, files)`` counts.
+
+        Everything trashed together shares one ``deleted_at`` so restore() can
+        bring back exactly that set. Rows are hard-deleted later by purge_trash.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            totals = Folder.all_objects.filter(pk=self.pk).values_list('total_files', 'total_size').get()
+            files = File.objects.filter(folder__path__startswith=self.path).update(deleted_at=now)
+            folders = Folder.objects.filter(path__startswith=self.path).update(deleted_at=now)
+            # The subtree keeps its own rollups for a restore; only the ancestors lose it
+            Folder.all_objects.add_to_totals({pk: (-totals[0], -totals[1]) for pk in self.ancestor_ids})
+            invalidate_folder_tree()
+        self.deleted_at = now
+        return folders, files
+
+    def restore(self):
+        """Bring back the folder and everything that was trashed along with it."""
+        if self.parent_id and Folder.all_objects.filter(pk=self.parent_id, deleted_at__isnull=False).exists():
+            raise ValueError("The parent folder is in the trash; restore it first")
+        with transaction.atomic():
+            deleted_at = self.deleted_at
+            totals = Folder.all_objects.filter(pk=self.pk).values_list('total_files', 'total_size').get()
+            Folder.all_objects.filter(path__startswith=self.path, deleted_at=deleted_at).update(deleted_at=None)
+            File.all_objects.filter(folder__path__startswith=self.path, deleted_at=deleted_at).update(deleted_at=None)
+            Folder.all_objects.add_to_totals({pk: totals for pk in self.ancestor_ids})
+            invalidate_folder_tree()
+        self.deleted_at = None
+
+    @property
+    def ancestor_ids(self):
+        """Ids of the ancestors of this folder, root first."""
+        return [int(pk) for pk in self.path.strip('/').split('/')[:-1]] if self.path else []
+
+    def get_ancestors(self):
+        return Folder.objects.filter(pk__in=self.ancestor_ids).order_by('depth')
+
+    def get_descendants(self, include_self=False):
+        queryset = Folder.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def __str__(self):
+        return self.name
+
+class StoragePurgeManager(models.Manager):
+    def queue(self, names, background=True):
+        """Record stored objects to delete; they are purged in the background after commit.
+
+        Management commands pass ``background=False`` and call purge_pending themselves.
+        """
+        rows = [self.model(name=name) for name in names if name]
+        if not rows:
+            return 0
+        self.bulk_create(rows)
+        if background:
+            from .purge import purge_pending
+            run_in_background(purge_pending)
+        return len(rows)
+
+
+class StoragePurge(models.Model):
+    """A stored object waiting to be deleted from storage (see files.purge)."""
+    name = models.CharField(max_length=1024)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StoragePurgeManager()
+
     def __str__(self):
         return self.name
 
+
+def queue_thumbnails(names):
+    """Generate thumbnails for freshly stored originals in the background after commit."""
+    names = [name for name in names if can_thumbnail(name)]
+    if names:
+        run_in_background(generate_many, File.file.field.storage, names)
+
+
+def blob_name(sha256, filename):
+    """Content-addressed storage name; the extension is kept so storages can guess the type."""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"hr_documents/blobs/{sha256[:2]}/{sha256}{ext}"
+
+
+class BlobManager(models.Manager):
+    def _reference(self, sha256):
+        """Take a reference on the blob with this hash, if there is one."""
+        blob = self.filter(sha256=sha256).first()
+        if blob is not None and self.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1):
+            return blob
+        return None
+
+    def ingest(self, content, filename):
+        """Store ``content`` once per distinct SHA-256.
+
+        Returns ``(blob, created)``; when the content is already stored the
+        storage write is skipped entirely and a reference is taken instead.
+        """
+        sha256 = content_sha256(content)
+        blob = self._reference(sha256)
+        if blob is not None:
+            return blob, False
+        name = self.model.file.field.storage.save(blob_name(sha256, filename), content)
+        return self.adopt(name, sha256, content.size)
+
+    def adopt(self, name, sha256, size):
+        """Register an object already written to storage as a blob.
+
+        If the same content is already stored (for instance a concurrent upload
+        won the race), the duplicate object is deleted and the existing blob is
+        referenced instead.
+        """
+        blob = self._reference(sha256)
+        if blob is None:
+            try:
+                with transaction.atomic():
+                    blob = self.create(sha256=sha256, file=name, size=size, ref_count=1)
+                    queue_thumbnails([blob.file.name])
+                    return blob, True
+            except IntegrityError:
+                blob = self._reference(sha256)
+        StoragePurge.objects.queue([name])
+        return blob, False
+
+    def ingest_many(self, uploads, max_workers=8):
+        """Store a batch of ``(content, filename)`` uploads, deduplicating by hash.
+
+        Existing blobs are looked up in one query, the storage writes for new
+        content run in a bounded thread pool, and the blob rows and reference
+        counts are written in a handful of statements. Returns one entry per
+        upload: ``(blob, created)`` or the exception that made it fail.
+        """
+        hashes = [content_sha256(content) for content, _ in uploads]
+        blobs = {blob.sha256: blob for blob in self.filter(sha256__in=set(hashes))}
+
+        # One storage write per distinct new hash
+        pending = {}
+        for sha256, (content, filename) in zip(hashes, uploads):
+            if sha256 not in blobs and sha256 not in pending:
+                pending[sha256] = (content, filename)
+
+        storage = self.model.file.field.storage
+        failures = {}
+        written = {}
+        if pending:
+            def write(item):
+                sha256, (content, filename) = item
+                return sha256, storage.save(blob_name(sha256, filename), content)
+
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+                futures = {executor.submit(write, item): item[0] for item in pending.items()}
+                for future in as_completed(futures):
+                    try:
+                        sha256, name = future.result()
+                        written[sha256] = name
+                    except Exception as e:
+                        failures[futures[future]] = e
+
+        references = Counter(sha256 for sha256 in hashes if sha256 not in failures)
+        created = set()
+        with transaction.atomic():
+            new_blobs = []
+            for sha256, name in written.items():
+                new_blobs.append(self.model(
+                    sha256=sha256, file=name, size=pending[sha256][0].size, ref_count=references[sha256]))
+            try:
+                with transaction.atomic():
+                    for blob in self.bulk_create(new_blobs):
+                        blobs[blob.sha256] = blob
+                        created.add(blob.sha256)
+                    queue_thumbnails([blob.file.name for blob in new_blobs])
+            except IntegrityError:
+                # A concurrent upload stored some of the same content: go one by one
+                for blob in new_blobs:
+                    adopted, was_created = self.adopt(blob.file.name, blob.sha256, blob.size)
+                    self.filter(pk=adopted.pk).update(
+                        ref_count=F('ref_count') + references[blob.sha256] - 1)
+                    blobs[blob.sha256] = adopted
+                    if was_created:
+                        created.add(blob.sha256)
+
+            by_count = defaultdict(list)
+            for sha256, count in references.items():
+                if sha256 not in written:
+                    by_count[count].append(blobs[sha256].pk)
+            for count, pks in by_count.items():
+                self.filter(pk__in=pks).update(ref_count=F('ref_count') + count)
+
+        results = []
+        for sha256 in hashes:
+            if sha256 in failures:
+                results.append(failures[sha256])
+            else:
+                # Only the first upload of new content counts as created
+                results.append((blobs[sha256], sha256 in created))
+                created.discard(sha256)
+        return results
+
+    def reference(self, blob_ids):
+        """Take one more reference per occurrence in ``blob_ids`` (files copied server-side)."""
+        by_count = defaultdict(list)
+        for pk, count in Counter(blob_ids).items():
+            by_count[count].append(pk)
+        for count, pks in by_count.items():
+            self.filter(pk__in=pks).update(ref_count=F('ref_count') + count)
+
+    def release(self, blob_ids):
+        """Drop one reference per occurrence in ``blob_ids``.
+
+        Blobs left without references are deleted and their stored objects
+        are queued for purging.
+        """
+        counts = Counter(blob_ids)
+        if not counts:
+            return
+        by_count = defaultdict(list)
+        for pk, count in counts.items():
+            by_count[count].append(pk)
+        for count, pks in by_count.items():
+            self.filter(pk__in=pks).update(ref_count=F('ref_count') - count)
+
+        unreferenced = self.filter(pk__in=counts, ref_count__lte=0, files__isnull=True)
+        names = list(unreferenced.values_list('file', flat=True))
+        unreferenced.delete()
+        StoragePurge.objects.queue(names + derivative_names(names))
+
+
+class Blob(models.Model):
+    """A stored object shared by every File with the same content."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='hr_documents/blobs/', max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = BlobManager()
+
+    def __str__(self):
+        return self.sha256
+
+
+class FileQuerySet(models.QuerySet):
+    def delete(self):
+        # Release the shared blobs and queue the stored objects in bulk rather
+        # than row by row; storage itself is purged in the background
+        with transaction.atomic():
+            rows = list(self.order_by().values_list('blob_id', 'file', 'folder_id', 'size', 'deleted_at'))
+            result = super().delete()
+            release_files(rows)
+        return result
+
+    def trash(self):
+        """Soft-delete the live files of this queryset; returns how many were trashed."""
+        with transaction.atomic():
+            rows = list(self.filter(deleted_at__isnull=True).order_by().values_list('pk', 'folder_id', 'size'))
+            File.all_objects.filter(pk__in=[pk for pk, _, _ in rows]).update(deleted_at=timezone.now())
+            Folder.all_objects.update_rollups((folder_id, -1, -size) for _, folder_id, size in rows)
+            invalidate_folder_tree()
+        return len(rows)
+
+
+class LiveFileManager(models.Manager.from_queryset(FileQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+def release_files(rows):
+    """Release deleted File rows, given as ``(blob_id, name, folder_id, size, deleted_at)`` tuples.
+
+    Folder rollups are decremented (trashed rows already were) and the storage
+    behind the rows released.
+    """
+    invalidate_folder_tree()
+    Folder.all_objects.update_rollups(
+        (folder_id, -1, -size) for _, _, folder_id, size, deleted_at in rows if deleted_at is None)
+    release_content([(row[0], row[1]) for row in rows])
+
+
+def release_content(rows):
+    """Release the stored content of ``(blob_id, name)`` pairs a row stopped using."""
+    Blob.objects.release([blob_id for blob_id, _ in rows if blob_id])
+    # Files stored before blobs existed own their object, unless a row still uses it
+    names = {name for blob_id, name in rows if not blob_id and name}
+    if names:
+        names -= set(File.all_objects.filter(file__in=names).values_list('file', flat=True))
+        StoragePurge.objects.queue(list(names) + derivative_names(names))
+
+
 class File(models.Model):
     name = models.CharField(max_length=255)
     file = models.FileField(upload_to='hr_documents/')
@@ -19,11 +475,174 @@ class File(models.Model):
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
     upload_date = models.DateTimeField(auto_now_add=True)
     size = models.BigIntegerField()
-    
+    # Hex SHA-256 of the content, used as the strong ETag for downloads
+    sha256 = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Shared content; ``file`` then points at the blob's storage name
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='files')
+    # Described once at upload (see files.uploadhandlers) so downloads and
+    # listings never have to probe storage: the sniffed type, the content MD5
+    # (or S3's multipart ETag for chunked uploads) and the name as uploaded
+    content_type = models.CharField(max_length=255, blank=True, default='')
+    etag = models.CharField(max_length=64, blank=True, default='', editable=False)
+    original_filename = models.CharField(max_length=255, blank=True, default='')
+    # Set when the file is in the trash; hidden from ``objects`` until purged
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+
+    objects = LiveFileManager()
+    all_objects = FileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Cursor pagination of file listings (see hr_intranet.pagination)
+            models.Index(fields=['folder', '-upload_date', '-id'], name='file_folder_uploaded_idx'),
+            models.Index(fields=['-upload_date', '-id'], name='file_uploaded_idx'),
+        ]
+
+    # Set by save() when the uploaded content was already stored
+    deduplicated = False
+
     def save(self, *args, **kwargs):
         if not self.size:
             self.size = self.file.size
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = File.all_objects.filter(pk=self.pk).values_list(
+                    'folder_id', 'size', 'blob_id', 'file').first()
+            replaced = bool(previous and self.file and not self.file._committed)
+            if replaced:
+                # New content for an existing row (an update with a file): describe it afresh
+                self.size = self.file.size
+                self.content_type = self.etag = self.original_filename = ''
+            if self.file and not self.file._committed:
+                _, md5, content_type = describe_content(self.file.file, self.file.name)
+                self.content_type = self.content_type or content_type
+                self.etag = self.etag or md5
+                self.original_filename = self.original_filename or os.path.basename(self.file.name)
+                # New content: store it once per distinct hash and point at the shared blob
+                blob, created = Blob.objects.ingest(self.file.file, self.file.name)
+                self.blob = blob
+                self.sha256 = blob.sha256
+                self.file = blob.file.name
+                self.deduplicated = not created
+            super().save(*args, **kwargs)
+            changes = [(self.folder_id, 1, self.size)]
+            if previous:
+                changes.append((previous[0], -1, -previous[1]))
+            Folder.all_objects.update_rollups(changes)
+            invalidate_folder_tree()
+            if replaced:
+                release_content([previous[2:]])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            release_files([(self.blob_id, self.file.name, self.folder_id, self.size, self.deleted_at)])
+        return result
+
+    def copy(self, folder, user, name=None):
+        """Unsaved copy of this row pointing at the same stored object (and blob)."""
+        return File(
+            name=name or self.name,
+            file=self.file.name,
+            folder=folder,
+            uploaded_by=user,
+            size=self.size,
+            sha256=self.sha256,
+            blob_id=self.blob_id,
+            content_type=self.content_type,
+            etag=self.etag,
+            original_filename=self.original_filename,
+        )
+
+    def copy_to(self, folder, user, name=None):
+        """Copy the file into ``folder`` without copying its content.
+
+        The copy references the same blob; files stored before blobs existed
+        share their object too, which release_files only purges once no row
+        uses it any more.
+        """
+        with transaction.atomic():
+            copy = self.copy(folder, user, name)
+            copy.save()
+            if self.blob_id:
+                Blob.objects.reference([self.blob_id])
+        return copy
+
+    def trash(self):
+        File.all_objects.filter(pk=self.pk).trash()
+        self.deleted_at = timezone.now()
+
+    def restore(self):
+        if self.folder_id and Folder.all_objects.filter(pk=self.folder_id, deleted_at__isnull=False).exists():
+            raise ValueError("The folder of this file is in the trash; restore the folder first")
+        with transaction.atomic():
+            if File.all_objects.filter(pk=self.pk, deleted_at__isnull=False).update(deleted_at=None):
+                Folder.all_objects.update_rollups([(self.folder_id, 1, self.size)])
+                invalidate_folder_tree()
+        self.deleted_at = None
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class UploadSession(models.Model):
+    """A resumable upload: chunks are PUT at increasing offsets, then finalized into a File."""
+    STATUS_CHOICES = [
+        ("active", "Active"),
+        ("completed", "Completed"),
+        ("aborted", "Aborted"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255)
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, null=True, blank=True)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Final storage name reserved when the session starts
+    storage_name = models.CharField(max_length=1024)
+    # Multipart upload id on S3-compatible storages
+    upload_id = models.CharField(max_length=1024, blank=True, default='')
+    offset = models.BigIntegerField(default=0)
+    # Uploaded parts as [{"PartNumber": n, "ETag": "..."}]
+    parts = models.JSONField(default=list, blank=True)
+    # Sniffed from the first chunk
+    content_type = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    file = models.ForeignKey(File, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"UploadSession({self.name}, {self.offset}/{self.size}, {self.status})"
+
+
+class ExportJob(models.Model):
+    """A ZIP of selected files and folders, built in the background (see files.exports).
+
+    ``cache_key`` hashes the archive's entries (names and content hashes), so
+    identical exports share one stored archive.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    name = models.CharField(max_length=255)
+    # Snapshot of the entries as [[arcname, file_id], ...] taken when the job is created
+    manifest = models.JSONField(default=list, blank=True)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    archive = models.FileField(upload_to='exports/', max_length=1024, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"ExportJob({self.name}, {self.status})"
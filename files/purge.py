@@ -0,0 +1,51 @@
+"""Background deletion of stored objects queued in StoragePurge."""
+import logging
+
+from django.db.models import F
+
+from .models import Blob, File, StoragePurge
+
+logger = logging.getLogger(__name__)
+
+# S3 DeleteObjects accepts at most 1000 keys per call
+PURGE_BATCH_SIZE = 1000
+MAX_ATTEMPTS = 5
+
+
+def delete_objects(storage, names):
+    """Delete ``names`` from ``storage``; returns ``{name: error}`` for failures."""
+    if hasattr(storage, 'delete_many'):
+        return storage.delete_many(names)
+    failed = {}
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception as e:
+            failed[name] = str(e)
+    return failed
+
+
+def purge_pending(batch_size=PURGE_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Delete queued objects from storage in batches; returns how many were purged."""
+    storage = File.file.field.storage
+    purged = 0
+    while True:
+        batch = list(StoragePurge.objects.filter(attempts__lt=max_attempts).order_by('id')[:batch_size])
+        if not batch:
+            break
+        names = {entry.name for entry in batch}
+        # Never delete an object that is (again) referenced by a row
+        referenced = set(File.all_objects.filter(file__in=names).values_list('file', flat=True))
+        referenced |= set(Blob.objects.filter(file__in=names).values_list('file', flat=True))
+        failed = delete_objects(storage, sorted(names - referenced))
+
+        done = [entry.pk for entry in batch if entry.name not in failed]
+        StoragePurge.objects.filter(pk__in=done).delete()
+        for entry in batch:
+            if entry.name in failed:
+                StoragePurge.objects.filter(pk=entry.pk).update(
+                    attempts=F('attempts') + 1, last_error=failed[entry.name][:1000])
+        purged += len(done)
+        if failed:
+            logger.warning('Failed to purge %d stored object(s), will retry', len(failed))
+    return purged
@@ -0,0 +1,115 @@
+"""Sorted-merge comparison of stored objects with the rows that reference them.
+
+Both sides are streamed in binary key order (a paginated bucket listing and
+``.iterator()`` queries), so reconciling millions of keys needs constant memory.
+"""
+import heapq
+
+from django.db import connection
+from django.db.models.functions import Collate
+
+from .models import Blob, ExportJob, File
+from .thumbnails import derivative_source
+
+ORPHAN = 'orphan'  # stored object without a row
+DANGLING = 'dangling'  # row whose stored object is missing
+MATCHED = 'matched'
+
+
+def iter_storage_keys(storage, prefix=''):
+    """Yield ``(name, size, last_modified)`` for the objects under ``prefix`` in key order."""
+    if hasattr(storage, 'iter_keys'):
+        yield from storage.iter_keys(prefix)
+        return
+    # Local storage: walk the directories, sorting folders as "name/" so the
+    # result follows the same order a bucket listing would
+    directory, _, name_prefix = prefix.rpartition('/')
+    try:
+        yield from _iter_local_keys(storage, f'{directory}/' if directory else '', name_prefix)
+    except FileNotFoundError:
+        return
+
+
+def _iter_local_keys(storage, path, name_prefix=''):
+    dirs, files = storage.listdir(path)
+    entries = [(d + '/', True) for d in dirs] + [(f, False) for f in files]
+    for entry, is_dir in sorted(entries):
+        if not entry.startswith(name_prefix):
+            continue
+        name = path + entry
+        if is_dir:
+            yield from _iter_local_keys(storage, name)
+        else:
+            yield name, storage.size(name), storage.get_modified_time(name)
+
+
+def _binary_collation():
+    return {'postgresql': 'C', 'sqlite': 'BINARY', 'mysql': 'utf8mb4_bin'}.get(connection.vendor)
+
+
+def _ordered_names(queryset, prefix, chunk_size, field='file'):
+    queryset = queryset.exclude(**{field: ''}).filter(**{f'{field}__startswith': prefix})
+    collation = _binary_collation()
+    order = Collate(field, collation) if collation else field
+    return queryset.order_by(order).values_list(field, flat=True).iterator(chunk_size=chunk_size)
+
+
+def iter_db_keys(prefix='', chunk_size=2000):
+    """Yield every stored name referenced by File, Blob or ExportJob rows once, in key order."""
+    previous = None
+    merged = heapq.merge(
+        _ordered_names(File.all_objects.all(), prefix, chunk_size),
+        _ordered_names(Blob.objects.all(), prefix, chunk_size),
+        # Archives are shared by every job with the same content
+        _ordered_names(ExportJob.objects.all(), prefix, chunk_size, field='archive'),
+    )
+    for name in merged:
+        if name != previous:
+            yield name
+            previous = name
+
+
+def _check_derivatives(objects):
+    """Thumbnails are kept while the original they were made from is referenced."""
+    sources = {derivative_source(obj[0]) for obj in objects}
+    referenced = set(File.all_objects.filter(file__in=sources).values_list('file', flat=True))
+    referenced |= set(Blob.objects.filter(file__in=sources).values_list('file', flat=True))
+    for obj in objects:
+        yield (MATCHED if derivative_source(obj[0]) in referenced else ORPHAN, *obj)
+
+
+def reconcile(storage, prefix='', chunk_size=2000):
+    """Merge both sorted streams, yielding ``(status, name, size, last_modified)``.
+
+    ``size`` and ``last_modified`` are None for dangling rows. Thumbnails are
+    set aside from the merge and checked against their originals in batches.
+    """
+    derivatives = []
+
+    def originals():
+        for obj in iter_storage_keys(storage, prefix):
+            if derivative_source(obj[0]):
+                derivatives.append(obj)
+            else:
+                yield obj
+
+    stored = originals()
+    referenced = iter_db_keys(prefix, chunk_size)
+    obj = next(stored, None)
+    name = next(referenced, None)
+    while obj is not None or name is not None:
+        if name is None or (obj is not None and obj[0] < name):
+            yield (ORPHAN, *obj)
+            obj = next(stored, None)
+        elif obj is None or name < obj[0]:
+            yield DANGLING, name, None, None
+            name = next(referenced, None)
+        else:
+            yield (MATCHED, *obj)
+            obj = next(stored, None)
+            name = next(referenced, None)
+        if len(derivatives) >= chunk_size:
+            yield from _check_derivatives(derivatives)
+            derivatives.clear()
+    if derivatives:
+        yield from _check_derivatives(derivatives)
@@ -0,0 +1,44 @@
+"""Full recomputation of the Folder rollup columns (total_size, total_files, last_modified)."""
+from collections import defaultdict
+
+from django.db.models import Count, Max, Sum
+
+
+def rebuild_rollups(folder_model, file_model, batch_size=500):
+    """Recompute every folder's rollups from the File table; returns the number of folders changed.
+
+    Takes the models as arguments so data migrations can pass their historical
+    versions. One aggregate query gives the per-folder figures, which are then
+    added to every ancestor using the folder paths. The default managers hide
+    trashed rows, so trashed folders keep the totals they were trashed with.
+    """
+    direct = {
+        row['folder_id']: row
+        for row in file_model.objects.filter(folder__isnull=False).order_by()
+        .values('folder_id').annotate(files=Count('id'), size=Sum('size'), latest=Max('upload_date'))
+    }
+    folders = list(folder_model.objects.only('id', 'path', 'total_size', 'total_files', 'last_modified'))
+    totals = defaultdict(lambda: [0, 0, None])
+    for folder in folders:
+        row = direct.get(folder.pk)
+        if not row:
+            continue
+        for pk in folder.path.strip('/').split('/'):
+            if not pk:
+                continue
+            total = totals[int(pk)]
+            total[0] += row['files']
+            total[1] += row['size'] or 0
+            if total[2] is None or row['latest'] > total[2]:
+                total[2] = row['latest']
+
+    changed = []
+    for folder in folders:
+        files, size, latest = totals.get(folder.pk, (0, 0, None))
+        if (folder.total_files, folder.total_size) != (files, size) or (latest and folder.last_modified != latest):
+            folder.total_files, folder.total_size = files, size
+            folder.last_modified = latest or folder.last_modified
+            changed.append(folder)
+    folder_model.objects.bulk_update(
+        changed, ['total_files', 'total_size', 'last_modified'], batch_size=batch_size)
+    return len(changed)
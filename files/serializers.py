@@ -1,14 +1,52 @@
 from rest_framework import serializers
-from .models import File, Folder
+from .models import ExportJob, File, Folder, UploadSession
 
 class FolderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Folder
-        fields = ['id', 'name', 'parent', 'created_by', 'created_at']
-        read_only_fields = ['created_by', 'created_at']
+        fields = ['id', 'name', 'parent', 'created_by', 'created_at', 'total_size', 'total_files', 'last_modified',
+                  'deleted_at']
+        read_only_fields = ['created_by', 'created_at', 'total_size', 'total_files', 'last_modified', 'deleted_at']
+
+    def validate_parent(self, value):
+        if value and self.instance and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A folder cannot be moved into itself or one of its subfolders")
+        return value
 
 class FileSerializer(serializers.ModelSerializer):
     class Meta:
         model = File
-        fields = ['id', 'name', 'file', 'folder', 'upload_date', 'size', 'uploaded_by']
-        read_only_fields = ['upload_date', 'size', 'uploaded_by']
\ No newline at end of file
+        fields = ['id', 'name', 'file', 'folder', 'upload_date', 'size', 'uploaded_by', 'sha256',
+                  'content_type', 'etag', 'original_filename', 'deleted_at']
+        read_only_fields = ['upload_date', 'size', 'uploaded_by', 'sha256', 'content_type', 'etag',
+                            'original_filename', 'deleted_at']
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'name', 'folder', 'size', 'chunk_size', 'offset', 'status', 'file', 'created_at', 'updated_at']
+        read_only_fields = ['chunk_size', 'offset', 'status', 'file', 'created_at', 'updated_at']
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Size must be positive")
+        return value
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    files = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    folders = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    entries = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'name', 'files', 'folders', 'entries', 'status', 'size', 'error', 'created_at', 'updated_at']
+        read_only_fields = ['status', 'size', 'error', 'created_at', 'updated_at']
+        extra_kwargs = {'name': {'required': False}}
+
+    def get_entries(self, obj):
+        return len(obj.manifest)
+
+    def validate(self, attrs):
+        if not attrs.get('files') and not attrs.get('folders'):
+            raise serializers.ValidationError("Select at least one file or folder")
+        return attrs
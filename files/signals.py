@@ -0,0 +1,44 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .exports import release_archives
+from .models import ExportJob, File, Folder, UploadSession
+from .uploads import get_upload_backend
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='files_user_deleting')
+def user_deleting(sender, instance, **kwargs):
+    """Delete a user's folders and files through their querysets before the cascade does.
+
+    The cascade deletes rows directly, which would skip the blob release,
+    rollup updates and storage purge done by FolderQuerySet.delete and
+    FileQuerySet.delete. Rows already gone are simply not found by it.
+    """
+    Folder.all_objects.filter(created_by=instance).delete()
+    File.all_objects.filter(uploaded_by=instance).delete()
+
+    # Unfinished chunked uploads hold staged parts (or an S3 multipart upload)
+    active = list(UploadSession.objects.filter(uploaded_by=instance, status='active'))
+    if active:
+        transaction.on_commit(lambda: abort_sessions(active))
+
+    # Export jobs go with the cascade; their archives once no other job shares them
+    archives = list(ExportJob.objects.filter(requested_by=instance).exclude(archive='')
+                    .values_list('archive', flat=True))
+    if archives:
+        transaction.on_commit(lambda: release_archives(archives))
+
+
+def abort_sessions(sessions):
+    backend = get_upload_backend(File.file.field.storage)
+    for session in sessions:
+        try:
+            backend.abort(session)
+        except Exception:
+            logger.exception('Could not abort upload session %s', session.pk)
@@ -1,3 +1,816 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .delivery import RangeNotSatisfiable, parse_range
+from .exports import build_export
+from .models import Blob, ExportJob, File, Folder, StoragePurge, UploadSession
+from .reconcile import DANGLING, MATCHED, ORPHAN, reconcile
+from .rollups import rebuild_rollups
+from .thumbnails import generate_thumbnails
+from .trash import purge_expired
+from .uploadhandlers import sniff_content_type
+from .uploads import StagedUploadBackend, hash_upload
+from .zipstream import iter_zip
+
+User = get_user_model()
+
+
+def zip_entries(*files):
+    """``iter_zip`` entries for ``(arcname, content, content_type)`` tuples."""
+    return [
+        (arcname, lambda content=content: io.BytesIO(content), len(content), (2026, 1, 5, 9, 30, 0), content_type)
+        for arcname, content, content_type in files
+    ]
+
+
+class ZipStreamTests(SimpleTestCase):
+    def test_round_trip(self):
+        files = [
+            ('a.txt', b'hello', 'text/plain'),
+            ('nested/dir/b.bin', bytes(range(256)) * 1000, 'application/octet-stream'),
+            ('empty.txt', b'', 'text/plain'),
+        ]
+        chunks = list(iter_zip(zip_entries(*files), chunk_size=4096))
+        self.assertGreater(len(chunks), 1)
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), [arcname for arcname, _, _ in files])
+            for arcname, content, _ in files:
+                self.assertEqual(archive.read(arcname), content)
+            self.assertEqual(archive.getinfo('a.txt').date_time, (2026, 1, 5, 9, 30, 0))
+
+    def test_unknown_size(self):
+        content = b'x' * 100000
+        entries = [('a.txt', lambda: io.BytesIO(content), None, (2026, 1, 5, 0, 0, 0), 'text/plain')]
+        with zipfile.ZipFile(io.BytesIO(b''.join(iter_zip(entries)))) as archive:
+            self.assertEqual(archive.read('a.txt'), content)
+
+    def compress_types(self, files, **kwargs):
+        with zipfile.ZipFile(io.BytesIO(b''.join(iter_zip(zip_entries(*files), **kwargs)))) as archive:
+            for arcname, content, _ in files:
+                self.assertEqual(archive.read(arcname), content)
+            return {info.filename: info.compress_type for info in archive.infolist()}
+
+    def test_compressed_formats_are_stored(self):
+        text = b'Name,Days\n' * 500
+        types = self.compress_types([
+            ('scan.pdf', b'%PDF-1.7' + b'\0' * 5000, 'application/pdf'),
+            ('photo.jpg', b'\xff\xd8\xff' + b'\0' * 5000, 'image/jpeg'),
+            ('leave.csv', text, 'text/csv'),
+            ('notes.txt', text, ''),  # type guessed from the name
+            ('tiny.txt', b'small', 'text/plain'),
+        ])
+        self.assertEqual(types, {
+            'scan.pdf': zipfile.ZIP_STORED,
+            'photo.jpg': zipfile.ZIP_STORED,
+            'leave.csv': zipfile.ZIP_DEFLATED,
+            'notes.txt': zipfile.ZIP_DEFLATED,
+            'tiny.txt': zipfile.ZIP_STORED,
+        })
+
+    def test_falls_back_to_stored_once_the_cpu_budget_is_spent(self):
+        text = b'Name,Days\n' * 500
+        files = [('1.txt', text, 'text/plain'), ('2.txt', text, 'text/plain'), ('3.txt', text, 'text/plain')]
+        # Every timed write costs one second of CPU
+        with mock.patch('files.zipstream.time.thread_time', side_effect=range(100)):
+            types = self.compress_types(files, cpu_budget=2)
+        self.assertEqual(types, {'1.txt': zipfile.ZIP_DEFLATED, '2.txt': zipfile.ZIP_DEFLATED,
+                                 '3.txt': zipfile.ZIP_STORED})
+        self.assertEqual(set(self.compress_types(files, cpu_budget=0).values()), {zipfile.ZIP_STORED})
+
+
+@override_settings(BACKGROUND_TASKS_ENABLED=False)
+class StorageTestCase(TestCase):
+    """Files are written to a throwaway MEDIA_ROOT; nothing runs in the background."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.hr = User.objects.create_user(username='hr', email='hr@example.com', password='x', is_hr=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.hr)
+
+    def upload(self, folder, *files):
+        response = self.client.post('/api/files/upload/', {
+            'folder': folder.pk if folder else '',
+            'files': [SimpleUploadedFile(name, content) for name, content in files],
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def create_file(self, folder, name, content):
+        return File.objects.create(
+            name=name, file=SimpleUploadedFile(name, content), folder=folder, uploaded_by=self.hr)
+
+    def assertRollupsConsistent(self):
+        """The incrementally maintained totals match a full recomputation."""
+        def totals():
+            return list(Folder.all_objects.order_by('pk').values_list('pk', 'total_files', 'total_size'))
+
+        before = totals()
+        rebuild_rollups(Folder, File)
+        self.assertEqual(before, totals())
+
+    def assertRefCountsConsistent(self):
+        """Every blob is referenced by exactly ref_count rows, and none is left unreferenced."""
+        for blob in Blob.objects.all():
+            self.assertEqual(blob.ref_count, File.all_objects.filter(blob=blob).count(), blob.sha256)
+            self.assertGreater(blob.ref_count, 0)
+
+
+
+class BlobRefCountTests(StorageTestCase):
+    def test_dedup(self):
+        folder = Folder.objects.create(name='a')
+        self.upload(folder, ('a.txt', b'same'), ('b.txt', b'same'), ('c.txt', b'other'))
+        self.create_file(folder, 'd.txt', b'same')
+        self.assertEqual(Blob.objects.count(), 2)
+        self.assertEqual(Blob.objects.get(size=4).ref_count, 3)
+        self.assertRefCountsConsistent()
+
+    def test_copy(self):
+        source = Folder.objects.create(name='a')
+        target = Folder.objects.create(name='b')
+        self.upload(source, ('a.txt', b'content'))
+        self.client.post(f'/api/files/folders/{source.pk}/copy/', {'parent': target.pk}, format='json')
+        file_obj = File.objects.filter(folder=source).get()
+        self.client.post(f'/api/files/files/{file_obj.pk}/copy/', {'folder': target.pk}, format='json')
+        self.assertEqual(Blob.objects.get().ref_count, 3)
+        self.assertRefCountsConsistent()
+
+    def test_delete(self):
+        folder = Folder.objects.create(name='a')
+        self.upload(folder, ('a.txt', b'same'), ('b.txt', b'same'))
+        File.all_objects.filter(name='a.txt').delete()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertRefCountsConsistent()
+
+        File.all_objects.filter(name='b.txt').delete()
+        self.assertFalse(Blob.objects.exists())
+
+    def test_replacing_the_content_reingests_it(self):
+        file_obj = self.create_file(None, 'a.txt', b'old')
+        old_blob = file_obj.blob
+        content = b'new content, longer'
+        response = self.client.patch(f'/api/files/files/{file_obj.pk}/', {
+            'file': SimpleUploadedFile('b.txt', content),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        file_obj.refresh_from_db()
+        self.assertEqual(file_obj.size, len(content))
+        self.assertEqual(file_obj.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(file_obj.etag, hashlib.md5(content).hexdigest())
+        self.assertEqual(file_obj.original_filename, 'b.txt')
+        self.assertEqual(file_obj.file.name, file_obj.blob.file.name)
+        with file_obj.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        # The old content is no longer used by anyone
+        self.assertFalse(Blob.objects.filter(pk=old_blob.pk).exists())
+        self.assertTrue(StoragePurge.objects.filter(name=old_blob.file.name).exists())
+        self.assertRefCountsConsistent()
+
+
+class ReconcileStorageTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = File.file.field.storage
+        self.kept = self.create_file(None, 'kept.txt', b'kept')
+        self.orphan = self.storage.save('hr_documents/orphan.txt', ContentFile(b'nobody uses me'))
+        self.missing = File.objects.create(
+            name='missing.txt', file='hr_documents/missing.txt', size=5, uploaded_by=self.hr)
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_storage', '--min-age-hours=0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_orphans_and_dangling_rows(self):
+        self.assertEqual(sorted((status, name) for status, name, _, _ in reconcile(self.storage, 'hr_documents/')), [
+            (DANGLING, 'hr_documents/missing.txt'),
+            (MATCHED, self.kept.file.name),
+            (ORPHAN, self.orphan),
+        ])
+        self.assertIn('1 matched, 1 orphaned object(s), 1 dangling row reference(s)', self.reconcile())
+        # Reporting changes nothing
+        self.assertTrue(self.storage.exists(self.orphan))
+        self.assertTrue(File.objects.filter(pk=self.missing.pk).exists())
+        self.assertFalse(StoragePurge.objects.exists())
+
+    def test_recent_objects_are_left_alone(self):
+        out = io.StringIO()
+        call_command('reconcile_storage', '--delete-orphans', stdout=out)
+        self.assertIn('1 recent object(s) skipped', out.getvalue())
+        self.assertTrue(self.storage.exists(self.orphan))
+
+    def test_delete_orphans_queues_and_purges_them(self):
+        with mock.patch('files.management.commands.reconcile_storage.purge_pending', return_value=0):
+            self.reconcile('--delete-orphans')
+        self.assertEqual(list(StoragePurge.objects.values_list('name', flat=True)), [self.orphan])
+
+        self.reconcile('--delete-orphans')
+        self.assertFalse(self.storage.exists(self.orphan))
+        self.assertTrue(self.storage.exists(self.kept.file.name))
+        self.assertFalse(StoragePurge.objects.exists())
+
+    def test_delete_dangling_removes_the_rows(self):
+        self.assertIn('Deleted 1 row(s) with missing objects', self.reconcile('--delete-dangling'))
+        self.assertFalse(File.all_objects.filter(pk=self.missing.pk).exists())
+        self.assertTrue(File.objects.filter(pk=self.kept.pk).exists())
+
+
+class FolderRollupTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = Folder.objects.create(name='a')
+        self.b = Folder.objects.create(name='b', parent=self.a)
+        self.c = Folder.objects.create(name='c', parent=self.b)
+        self.d = Folder.objects.create(name='d')
+        self.upload(self.b, ('one.txt', b'1' * 10), ('two.txt', b'2' * 20))
+        self.create_file(self.c, 'three.txt', b'3' * 30)
+
+    def totals(self, folder):
+        return Folder.all_objects.values_list('total_files', 'total_size').get(pk=folder.pk)
+
+    def test_upload(self):
+        self.assertEqual(self.totals(self.a), (3, 60))
+        self.assertEqual(self.totals(self.b), (3, 60))
+        self.assertEqual(self.totals(self.c), (1, 30))
+        self.assertRollupsConsistent()
+
+    def test_move_folder_and_file(self):
+        response = self.client.post(f'/api/files/folders/{self.b.pk}/move/', {'parent': self.d.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(self.a), (0, 0))
+        self.assertEqual(self.totals(self.d), (3, 60))
+
+        three = File.objects.get(name='three.txt')
+        response = self.client.post(f'/api/files/files/{three.pk}/move/', {'folder': self.a.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(self.a), (1, 30))
+        self.assertEqual(self.totals(self.c), (0, 0))
+        self.assertRollupsConsistent()
+
+    def test_copy(self):
+        response = self.client.post(f'/api/files/folders/{self.b.pk}/copy/', {'parent': self.d.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.totals(self.d), (3, 60))
+        self.assertEqual(self.totals(self.a), (3, 60))
+
+        one = File.objects.get(name='one.txt', folder=self.b)
+        response = self.client.post(f'/api/files/files/{one.pk}/copy/', {'folder': self.c.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.totals(self.a), (4, 70))
+        self.assertRollupsConsistent()
+
+    def test_trash_and_restore(self):
+        response = self.client.delete(f'/api/files/folders/{self.c.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(self.a), (2, 30))
+        # The trashed folder keeps its own totals for the restore
+        self.assertEqual(self.totals(self.c), (1, 30))
+        self.assertRollupsConsistent()
+
+        one = File.objects.get(name='one.txt')
+        self.client.delete(f'/api/files/files/{one.pk}/')
+        self.assertEqual(self.totals(self.b), (1, 20))
+        self.assertRollupsConsistent()
+
+        self.assertEqual(self.client.post(f'/api/files/folders/{self.c.pk}/restore/').status_code, 200)
+        self.assertEqual(self.client.post(f'/api/files/files/{one.pk}/restore/').status_code, 200)
+        self.assertEqual(self.totals(self.a), (3, 60))
+        self.assertRollupsConsistent()
+
+    def test_purge(self):
+        self.client.delete(f'/api/files/folders/{self.c.pk}/')
+        one = File.objects.get(name='one.txt')
+        self.client.delete(f'/api/files/files/{one.pk}/')
+        files, folders = purge_expired(retention_days=0, batch_size=1)
+        self.assertEqual((files, folders), (2, 1))
+        self.assertFalse(Folder.all_objects.filter(pk=self.c.pk).exists())
+        self.assertEqual(self.totals(self.a), (1, 20))
+        self.assertRollupsConsistent()
+
+    def test_hard_delete(self):
+        Folder.objects.filter(pk=self.b.pk).delete()
+        self.assertEqual(self.totals(self.a), (0, 0))
+        self.assertRollupsConsistent()
+
+    def test_deleting_a_user_releases_their_files(self):
+        uploader = User.objects.create_user(username='leaver', password='x', is_hr=True)
+        File.objects.create(name='four.txt', file=SimpleUploadedFile('four.txt', b'4' * 40),
+                            folder=self.c, uploaded_by=uploader)
+        folder = Folder.objects.create(name='e', parent=self.a, created_by=uploader)
+        File.objects.create(name='five.txt', file=SimpleUploadedFile('five.txt', b'5' * 50),
+                            folder=folder, uploaded_by=self.hr)
+        self.assertEqual(self.totals(self.a), (5, 150))
+
+        uploader.delete()
+        self.assertFalse(Folder.all_objects.filter(pk=folder.pk).exists())
+        self.assertEqual(self.totals(self.a), (3, 60))
+        self.assertRollupsConsistent()
+        self.assertEqual(Blob.objects.count(), 3)
+        self.assertEqual(StoragePurge.objects.count(), 2)
+
+
+class TrashTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.parent = Folder.objects.create(name='parent')
+        self.child = Folder.objects.create(name='child', parent=self.parent)
+        self.file = self.create_file(self.child, 'a.txt', b'content')
+
+    def test_trashed_rows_are_hidden_and_listed_in_the_trash(self):
+        self.assertEqual(self.client.delete(f'/api/files/folders/{self.child.pk}/').status_code, 200)
+        self.assertFalse(Folder.objects.filter(pk=self.child.pk).exists())
+        self.assertFalse(File.objects.filter(pk=self.file.pk).exists())
+
+        listed = self.client.get('/api/files/folders/trash/').json()['results']
+        self.assertEqual([row['id'] for row in listed], [self.child.pk])
+        self.assertIn('purge_after', listed[0])
+        # Files trashed with their folder are listed under it, not on their own
+        self.assertEqual(self.client.get('/api/files/files/trash/').json()['results'], [])
+
+    def test_restore_under_trashed_parent_conflicts(self):
+        self.client.delete(f'/api/files/folders/{self.child.pk}/')
+        self.client.delete(f'/api/files/folders/{self.parent.pk}/')
+        response = self.client.post(f'/api/files/folders/{self.child.pk}/restore/')
+        self.assertEqual(response.status_code, 409)
+
+        # The child was trashed on its own before its parent: it stays there
+        self.assertEqual(self.client.post(f'/api/files/folders/{self.parent.pk}/restore/').status_code, 200)
+        self.assertFalse(File.objects.filter(pk=self.file.pk).exists())
+        self.assertEqual(self.client.post(f'/api/files/folders/{self.child.pk}/restore/').status_code, 200)
+        self.assertTrue(File.objects.filter(pk=self.file.pk).exists())
+
+    def test_purge_only_takes_expired_rows(self):
+        self.client.delete(f'/api/files/folders/{self.child.pk}/')
+        self.assertEqual(purge_expired(), (0, 0))
+        self.assertTrue(File.all_objects.filter(pk=self.file.pk).exists())
+
+        self.assertEqual(purge_expired(retention_days=0), (1, 1))
+        self.assertFalse(Folder.all_objects.filter(pk=self.child.pk).exists())
+        self.assertTrue(Folder.objects.filter(pk=self.parent.pk).exists())
+        # The stored content is released and queued for deletion
+        self.assertFalse(Blob.objects.exists())
+        self.assertTrue(StoragePurge.objects.filter(name=self.file.file.name).exists())
+
+
+class MoveCopyTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = Folder.objects.create(name='a')
+        self.b = Folder.objects.create(name='b', parent=self.a)
+        self.c = Folder.objects.create(name='c', parent=self.b)
+        self.d = Folder.objects.create(name='d')
+        self.file = self.create_file(self.c, 'one.txt', b'1' * 10)
+
+    def move(self, folder, data):
+        return self.client.post(f'/api/files/folders/{folder.pk}/move/', data, format='json')
+
+    def test_move_rewrites_the_subtree_paths(self):
+        self.assertEqual(self.move(self.b, {'parent': self.d.pk}).status_code, 200)
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.path, f'/{self.d.pk}/{self.b.pk}/{self.c.pk}/')
+        self.assertEqual(self.c.depth, 2)
+
+        self.assertEqual(self.move(self.b, {'parent': None}).status_code, 200)
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.path, f'/{self.b.pk}/{self.c.pk}/')
+        self.assertEqual(self.c.depth, 1)
+        self.assertRollupsConsistent()
+
+    def test_move_into_own_subtree_is_rejected(self):
+        for target in (self.a, self.c):
+            self.assertEqual(self.move(self.a, {'parent': target.pk}).status_code, 400)
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.parent, self.a.path), (None, f'/{self.a.pk}/'))
+
+    def test_move_requires_the_target(self):
+        # A missing key is not taken to mean the top level
+        self.assertEqual(self.move(self.b, {}).status_code, 400)
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.parent, self.a)
+
+        response = self.client.post(f'/api/files/files/{self.file.pk}/move/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'/api/files/files/{self.file.pk}/move/', {'folder': None}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.file.refresh_from_db()
+        self.assertIsNone(self.file.folder)
+
+    def test_copy(self):
+        response = self.client.post(f'/api/files/folders/{self.b.pk}/copy/',
+                                    {'parent': self.d.pk, 'name': 'b copy'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        copy = Folder.objects.get(pk=response.json()['id'])
+        self.assertEqual((copy.name, copy.parent), ('b copy', self.d))
+        child = Folder.objects.get(parent=copy)
+        self.assertEqual((child.name, child.path), ('c', f'/{self.d.pk}/{copy.pk}/{child.pk}/'))
+        self.assertEqual(File.objects.get(folder=child).blob, self.file.blob)
+        self.assertRefCountsConsistent()
+
+        response = self.client.post(f'/api/files/folders/{self.a.pk}/copy/', {'parent': self.c.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'/api/files/folders/{self.a.pk}/copy/', {'parent': 999}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class FolderTreeTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.a = Folder.objects.create(name='a')
+        self.b = Folder.objects.create(name='b', parent=self.a)
+        self.c = Folder.objects.create(name='c', parent=self.b)
+        self.d = Folder.objects.create(name='D')
+        self.create_file(self.a, 'one.txt', b'1' * 10)
+        self.create_file(self.b, 'two.txt', b'2' * 20)
+        self.create_file(self.c, 'three.txt', b'3' * 30)
+
+    def tree(self, **params):
+        response = self.client.get('/api/files/folders/tree/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def shape(self, nodes):
+        """(name, direct files, direct size, total files, total size, has_children, children) per node."""
+        return [(node['name'], node['file_count'], node['size'], node['total_files'], node['total_size'],
+                 node['has_children'], self.shape(node['children'])) for node in nodes]
+
+    def test_whole_tree(self):
+        self.assertEqual(self.shape(self.tree().json()['folders']), [
+            ('a', 1, 10, 3, 60, True, [
+                ('b', 1, 20, 2, 50, True, [
+                    ('c', 1, 30, 1, 30, False, []),
+                ]),
+            ]),
+            ('D', 0, 0, 0, 0, False, []),
+        ])
+
+    def test_subtree_and_depth(self):
+        # Cut-off folders still say whether they have children to fetch
+        self.assertEqual(self.shape(self.tree(depth=1).json()['folders'])[0],
+                         ('a', 1, 10, 3, 60, True, [('b', 1, 20, 2, 50, True, [])]))
+        data = self.tree(root=self.b.pk, depth=0).json()
+        self.assertEqual(data['root'], self.b.pk)
+        self.assertEqual(self.shape(data['folders']), [('b', 1, 20, 2, 50, True, [])])
+        self.assertEqual(self.client.get('/api/files/folders/tree/', {'depth': -1}).status_code, 400)
+        self.assertEqual(self.client.get('/api/files/folders/tree/', {'root': 999}).status_code, 404)
+
+    def test_built_from_one_query_and_cached(self):
+        with self.assertNumQueries(1):
+            self.tree()
+        with self.assertNumQueries(0):
+            self.tree()
+
+    def test_etag_changes_with_the_folders(self):
+        etag = self.tree()['ETag']
+        response = self.client.get('/api/files/folders/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Folder.objects.create(name='e', parent=self.d)
+        response = self.client.get('/api/files/folders/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.shape(response.json()['folders'])[1], ('D', 0, 0, 0, 0, True, [
+            ('e', 0, 0, 0, 0, False, []),
+        ]))
+
+
+class PaginationTests(StorageTestCase):
+    def pages(self, url):
+        """Follow ``next`` links from ``url``; returns the ids of each page."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            # Keyset pages: no COUNT(*), so no total either
+            self.assertEqual(set(data), {'next', 'previous', 'results'})
+            self.assertEqual(data['previous'] is None, not pages)
+            pages.append([row['id'] for row in data['results']])
+            url = data['next']
+        return pages
+
+    def test_files_newest_first(self):
+        ids = [self.create_file(None, f'{n}.txt', b'x').pk for n in range(5)]
+        self.assertEqual(self.pages('/api/files/files/?page_size=2'), [ids[4:2:-1], ids[2:0:-1], ids[:1]])
+
+    def test_rows_tying_on_the_date_are_neither_skipped_nor_repeated(self):
+        ids = [self.create_file(None, f'{n}.txt', b'x').pk for n in range(5)]
+        File.objects.update(upload_date=File.objects.get(pk=ids[0]).upload_date)
+        pages = self.pages('/api/files/files/?page_size=2')
+        self.assertEqual(sorted(pk for page in pages for pk in page), ids)
+
+    def test_folders_newest_first(self):
+        ids = [Folder.objects.create(name=str(n)).pk for n in range(3)]
+        self.assertEqual(self.pages('/api/files/folders/?page_size=2'), [ids[2:0:-1], ids[:1]])
+
+
+class BrowseTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = Folder.objects.create(name='a')
+        self.b = Folder.objects.create(name='b', parent=self.a)
+        self.c = Folder.objects.create(name='c', parent=self.b)
+        self.url = f'/api/files/folders/{self.b.pk}/browse/'
+
+    def browse(self, params=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_folder_page_in_one_response(self):
+        one = self.create_file(self.b, 'one.txt', b'1')
+        self.create_file(self.c, 'two.txt', b'2')
+        data = self.browse().json()
+        self.assertEqual(data['folder']['id'], self.b.pk)
+        self.assertEqual(data['ancestors'], [{'id': self.a.pk, 'name': 'a'}])
+        self.assertEqual([folder['id'] for folder in data['folders']], [self.c.pk])
+        # Only the files directly in the folder
+        self.assertEqual([file['id'] for file in data['files']['results']], [one.pk])
+        self.assertIsNone(data['files']['next'])
+
+    def test_query_count_does_not_grow_with_the_folder(self):
+        # folder, files page, ancestors, subfolders
+        with self.assertNumQueries(4):
+            self.browse()
+        for n in range(5):
+            Folder.objects.create(name=f'sub{n}', parent=self.b)
+            self.create_file(self.b, f'{n}.txt', b'x')
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.browse().json()['files']['results']), 5)
+
+    def test_not_modified_until_something_changes(self):
+        etag = self.browse()['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # Each page has its own ETag
+        self.assertNotEqual(self.browse({'page_size': 1})['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_file(self.b, 'one.txt', b'1')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class UploadTargetTests(StorageTestCase):
+    def test_upload_into_trashed_or_missing_folder_is_rejected(self):
+        folder = Folder.objects.create(name='a')
+        folder.trash()
+        for folder_id in (folder.pk, 999, 'x'):
+            response = self.client.post('/api/files/upload/', {
+                'folder': folder_id, 'files': [SimpleUploadedFile('a.txt', b'content')],
+            }, format='multipart')
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(File.all_objects.exists())
+
+
+class ExportJobTests(StorageTestCase):
+    def export(self, folder):
+        response = self.client.post('/api/files/exports/', {'folders': [folder.pk]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        build_export(response.json()['id'])
+        return ExportJob.objects.get(pk=response.json()['id'])
+
+    def test_deleting_the_last_job_purges_the_shared_archive(self):
+        folder = Folder.objects.create(name='a')
+        self.create_file(folder, 'a.txt', b'content')
+        first, second = self.export(folder), self.export(folder)
+        self.assertEqual(first.status, 'ready')
+        self.assertEqual(first.archive.name, second.archive.name)
+
+        self.client.delete(f'/api/files/exports/{first.pk}/')
+        self.assertFalse(StoragePurge.objects.exists())
+        self.client.delete(f'/api/files/exports/{second.pk}/')
+        self.assertEqual(list(StoragePurge.objects.values_list('name', flat=True)), [second.archive.name])
+
+    def test_deleting_the_requester_purges_their_archives(self):
+        folder = Folder.objects.create(name='a')
+        self.create_file(folder, 'a.txt', b'content')
+        requester = User.objects.create_user(username='leaver', password='x')
+        self.client.force_authenticate(requester)
+        job = self.export(folder)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            requester.delete()
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertEqual(list(StoragePurge.objects.values_list('name', flat=True)), [job.archive.name])
+
+
+class SniffContentTypeTests(SimpleTestCase):
+    def test_bmp_needs_a_dib_header_or_a_bmp_name(self):
+        bitmap = b'BM' + b'\0' * 12 + (40).to_bytes(4, 'little')
+        self.assertEqual(sniff_content_type(bitmap, 'scan'), 'image/bmp')
+        self.assertEqual(sniff_content_type(b'BM....', 'scan.bmp'), 'image/bmp')
+        self.assertEqual(sniff_content_type(b'BMW,2024,lease', 'fleet.csv'), 'text/csv')
+        self.assertEqual(sniff_content_type(b'BM notes from the meeting', 'notes.txt'), 'text/plain')
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_whole_file(self):
+        for header in (None, '', 'items=0-1', 'bytes=abc', 'bytes=5', 'bytes=a-5', 'bytes=5-2'):
+            self.assertIsNone(parse_range(header, 10), header)
+
+    def test_single_range(self):
+        self.assertEqual(parse_range('bytes=0-4', 10), (0, 4))
+        self.assertEqual(parse_range('bytes=5-', 10), (5, 9))
+        self.assertEqual(parse_range('bytes=5-100', 10), (5, 9))
+        self.assertEqual(parse_range('bytes=-3', 10), (7, 9))
+        self.assertEqual(parse_range('bytes=-100', 10), (0, 9))
+
+    def test_not_satisfiable(self):
+        for header in ('bytes=10-', 'bytes=0-1,3-4', 'bytes=-0'):
+            with self.assertRaises(RangeNotSatisfiable, msg=header):
+                parse_range(header, 10)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=-1', 0)
+
+
+class DownloadTests(StorageTestCase):
+    content = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        self.upload(None, ('a.txt', self.content))
+        self.file = File.objects.get()
+        self.url = f'/api/files/files/{self.file.pk}/download/'
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+    def test_range_not_satisfiable(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(etag, f'"{self.file.sha256}"')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_range(self):
+        etag = f'"{self.file.sha256}"'
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-2', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'89')
+
+        # The client's copy is stale: it gets the whole current file instead
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-2', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+
+class UploadSessionTests(StorageTestCase):
+    chunk = 5 * 1024 * 1024
+
+    def setUp(self):
+        super().setUp()
+        staging = override_settings(FILE_UPLOAD_TEMP_DIR=self.media_root, FILES_UPLOAD_CHUNK_SIZE=self.chunk)
+        staging.enable()
+        self.addCleanup(staging.disable)
+        self.content = b'a' * self.chunk + b'tail'
+
+    def start(self):
+        response = self.client.post('/api/files/files/uploads/',
+                                     {'name': 'big.bin', 'size': len(self.content)}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return UploadSession.objects.get(pk=response.json()['id'])
+
+    def put(self, session, offset, data):
+        return self.client.put(f'/api/files/files/uploads/{session.pk}/?offset={offset}', data,
+                               content_type='application/octet-stream')
+
+    def staging_dir(self, session):
+        return StagedUploadBackend(None)._staging_dir(session)
+
+    def test_create_put_and_complete(self):
+        session = self.start()
+        self.assertEqual(session.chunk_size, self.chunk)
+        self.assertEqual(self.put(session, 0, self.content[:self.chunk]).json()['offset'], self.chunk)
+        # Chunks must arrive in order and exactly chunk_size bytes long (bar the last)
+        self.assertEqual(self.put(session, 0, self.content[:self.chunk]).status_code, 409)
+        self.assertEqual(self.put(session, self.chunk, b'tai').status_code, 400)
+        self.assertEqual(self.put(session, self.chunk, b'tail').json()['offset'], len(self.content))
+
+        response = self.client.post(f'/api/files/files/uploads/{session.pk}/complete/')
+        self.assertEqual(response.status_code, 201, response.content)
+        file_obj = File.objects.get()
+        self.assertEqual(file_obj.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(file_obj.blob.ref_count, 1)
+        with file_obj.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.file), ('completed', file_obj))
+        self.assertFalse(os.path.exists(self.staging_dir(session)))
+        self.assertRollupsConsistent()
+
+    def test_incomplete_upload_cannot_complete(self):
+        session = self.start()
+        self.put(session, 0, self.content[:self.chunk])
+        response = self.client.post(f'/api/files/files/uploads/{session.pk}/complete/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['offset'], self.chunk)
+        self.assertFalse(File.objects.exists())
+
+    def test_abort(self):
+        session = self.start()
+        self.put(session, 0, self.content[:self.chunk])
+        self.assertTrue(os.listdir(self.staging_dir(session)))
+
+        self.assertEqual(self.client.delete(f'/api/files/files/uploads/{session.pk}/').status_code, 204)
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'aborted')
+        self.assertFalse(os.path.exists(self.staging_dir(session)))
+        self.assertEqual(self.put(session, self.chunk, b'tail').status_code, 409)
+        self.assertEqual(self.client.post(f'/api/files/files/uploads/{session.pk}/complete/').status_code, 409)
+
+    def test_a_part_that_loses_the_race_is_not_recorded(self):
+        session = self.start()
+        put_part = StagedUploadBackend.put_part
+
+        def concurrent_put(backend, session, part_number, data):
+            # Another request stores and records the same part while this one is sending it
+            winner = put_part(backend, session, part_number, self.content[:self.chunk])
+            UploadSession.objects.filter(pk=session.pk).update(
+                offset=self.chunk, parts=[{'PartNumber': part_number, 'ETag': winner}])
+            return put_part(backend, session, part_number, data)
+
+        with mock.patch.object(StagedUploadBackend, 'put_part', autospec=True, side_effect=concurrent_put):
+            response = self.put(session, 0, b'b' * self.chunk)
+        self.assertEqual(response.status_code, 409)
+        self.put(session, self.chunk, b'tail')
+        self.client.post(f'/api/files/files/uploads/{session.pk}/complete/')
+        with File.objects.get().file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+
+    def test_hash_upload(self):
+        # What completing an S3 multipart upload leaves behind: no hash and no blob
+        def completed(name):
+            stored = File.file.field.storage.save(name, ContentFile(b'content'))
+            return File.objects.create(name=name, file=stored, size=7, uploaded_by=self.hr)
+
+        first, second = completed('a.txt'), completed('b.txt')
+        second_name = second.file.name
+        hash_upload(first.pk)
+        hash_upload(second.pk)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.sha256, hashlib.sha256(b'content').hexdigest())
+        self.assertEqual(first.blob, second.blob)
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertTrue(StoragePurge.objects.filter(name=second_name).exists())
+        self.assertRefCountsConsistent()
+
+
+class ThumbnailTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        image = io.BytesIO()
+        Image.new('RGB', (600, 400), 'red').save(image, 'PNG')
+        self.upload(None, ('photo.png', image.getvalue()))
+        self.url = f'/api/files/files/{File.objects.get().pk}/thumbnail/?size=256'
+
+    def test_missing_thumbnail_is_generated_once(self):
+        with mock.patch('files.views.generate_thumbnails', wraps=generate_thumbnails) as generate:
+            for _ in range(2):
+                response = self.client.get(self.url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'image/jpeg')
+                self.assertEqual(Image.open(io.BytesIO(b''.join(response.streaming_content))).size, (256, 171))
+        self.assertEqual(generate.call_count, 1)
+
+    def test_existing_thumbnail_is_opened_without_an_exists_check(self):
+        self.client.get(self.url)
+        with mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError) as exists:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        exists.assert_not_called()
@@ -0,0 +1,113 @@
+"""Thumbnails of stored images and PDFs, saved next to the original as ``<name>.thumb<size>.jpg``."""
+import io
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+try:
+    # PyMuPDF renders the first page of PDFs; without it PDFs get no preview
+    import fitz
+except ImportError:
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+PDF_EXTENSIONS = {'.pdf'}
+# Sources above this size are not read into memory for a preview
+MAX_SOURCE_SIZE = 50 * 1024 * 1024
+THUMBNAIL_QUALITY = 85
+
+DERIVATIVE_RE = re.compile(r'^(?P<source>.+)\.thumb(?P<size>\d+)\.jpg$')
+
+
+def thumbnail_sizes():
+    return sorted(getattr(settings, 'FILES_THUMBNAIL_SIZES', (128, 256, 512)))
+
+
+def thumbnail_name(name, size):
+    return f'{name}.thumb{size}.jpg'
+
+
+def derivative_source(name):
+    """Name of the original a thumbnail was made from, or None for anything else."""
+    match = DERIVATIVE_RE.match(name)
+    return match.group('source') if match else None
+
+
+def derivative_names(names):
+    """Every thumbnail name that may exist for ``names``."""
+    return [thumbnail_name(name, size) for name in names if can_thumbnail(name) for size in thumbnail_sizes()]
+
+
+def can_thumbnail(name):
+    ext = os.path.splitext(name)[1].lower()
+    return ext in IMAGE_EXTENSIONS or (ext in PDF_EXTENSIONS and fitz is not None)
+
+
+def pick_size(requested):
+    """Smallest configured size covering ``requested`` (the largest one otherwise)."""
+    sizes = thumbnail_sizes()
+    for size in sizes:
+        if size >= requested:
+            return size
+    return sizes[-1]
+
+
+def _render(source, name, max_size):
+    """Decode ``source`` into an RGB image no smaller than needed for ``max_size``."""
+    if os.path.splitext(name)[1].lower() in PDF_EXTENSIONS:
+        with fitz.open(stream=source.read(), filetype='pdf') as document:
+            page = document[0]
+            zoom = max_size / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    image = Image.open(source)
+    # Lets the JPEG decoder downscale while decoding instead of building the full bitmap
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # JPEG has no alpha: flatten onto white
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_thumbnails(storage, name, force=False):
+    """Create the missing thumbnails of ``name``; returns the names written."""
+    if not can_thumbnail(name):
+        return []
+    sizes = [size for size in thumbnail_sizes() if force or not storage.exists(thumbnail_name(name, size))]
+    if not sizes or storage.size(name) > MAX_SOURCE_SIZE:
+        return []
+
+    with storage.open(name, 'rb') as source:
+        image = _render(source, name, sizes[-1])
+
+    written = []
+    # Largest first, each one downscaled from the previous
+    for size in reversed(sizes):
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        target = thumbnail_name(name, size)
+        if storage.exists(target):
+            storage.delete(target)
+        written.append(storage.save(target, ContentFile(buffer.getvalue())))
+    return written
+
+
+def generate_many(storage, names):
+    """Background entry point: thumbnails for freshly stored originals, one at a time."""
+    for name in names:
+        try:
+            generate_thumbnails(storage, name)
+        except Exception:
+            logger.exception('Failed to generate thumbnails for %s', name)
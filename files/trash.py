@@ -0,0 +1,50 @@
+"""Hard deletion of files and folders that have been in the trash past the retention period."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import File, Folder
+
+# Rows hard-deleted per transaction, so no statement holds its locks for long
+TRASH_BATCH_SIZE = 200
+
+
+def retention_cutoff(retention_days=None):
+    if retention_days is None:
+        retention_days = getattr(settings, 'FILES_TRASH_RETENTION_DAYS', 30)
+    return timezone.now() - timedelta(days=retention_days)
+
+
+def purge_after(deleted_at):
+    """When a row trashed at ``deleted_at`` becomes eligible for purge_trash."""
+    return deleted_at + timedelta(days=getattr(settings, 'FILES_TRASH_RETENTION_DAYS', 30))
+
+
+def purge_expired(retention_days=None, batch_size=TRASH_BATCH_SIZE):
+    """Hard-delete expired trash in short transactions; returns ``(files, folders)`` deleted.
+
+    Files go first, so deleting a folder no longer has to cascade into them.
+    A trashed folder never holds rows trashed after it, so once its files are
+    gone its subfolders are removed deepest first.
+    """
+    cutoff = retention_cutoff(retention_days)
+    files = folders = 0
+
+    expired_files = File.all_objects.filter(deleted_at__lt=cutoff).order_by('pk')
+    while True:
+        batch = list(expired_files.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        # Blobs are released and their stored objects queued for purging
+        File.all_objects.filter(pk__in=batch).delete()
+        files += len(batch)
+
+    expired_folders = Folder.all_objects.filter(deleted_at__lt=cutoff).order_by('-depth', 'pk')
+    while True:
+        batch = list(expired_folders.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        _, deleted = Folder.all_objects.filter(pk__in=batch).delete()
+        folders += deleted.get('files.Folder', 0)
+    return files, folders
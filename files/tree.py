@@ -0,0 +1,90 @@
+"""Nested folder tree built from one query, cached until folders or files change."""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from hr_intranet.cache_versions import bump_version, get_version
+
+TREE_VERSION_KEY = 'files:folder-tree:version'
+
+
+def tree_version():
+    return get_version(TREE_VERSION_KEY)
+
+
+def invalidate_folder_tree():
+    """Drop every cached tree (and change the tree ETags) once the current transaction commits."""
+    transaction.on_commit(lambda: bump_version(TREE_VERSION_KEY))
+
+
+def tree_etag(root_id, depth):
+    key = f'{tree_version()}:{root_id}:{depth}'
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def build_tree(folders, root=None, depth=None):
+    """Nest ``folders`` (a Folder queryset) under ``root`` or the top level.
+
+    Totals come from the folder rollup columns, so this is a single query on
+    the folder table alone. Only ``depth`` levels below the root are returned;
+    one extra level is read to fill in ``has_children`` and direct file counts.
+    """
+    if root is not None:
+        folders = folders.filter(path__startswith=root.path)
+    max_depth = None
+    if depth is not None:
+        max_depth = (root.depth if root is not None else 0) + depth
+        folders = folders.filter(depth__lte=max_depth + 1)
+    rows = folders.order_by().values(
+        'id', 'name', 'parent_id', 'depth', 'created_at', 'total_files', 'total_size', 'last_modified')
+
+    nodes = {}
+    for row in rows:
+        nodes[row['id']] = {
+            'id': row['id'],
+            'name': row['name'],
+            'parent': row['parent_id'],
+            'created_at': row['created_at'],
+            'last_modified': row['last_modified'],
+            # Files directly in the folder: totals minus those of the subfolders
+            'file_count': row['total_files'],
+            'size': row['total_size'],
+            'total_files': row['total_files'],
+            'total_size': row['total_size'],
+            'children': [],
+            '_depth': row['depth'],
+        }
+
+    top = []
+    for node in nodes.values():
+        parent = nodes.get(node['parent'])
+        if parent is None:
+            top.append(node)
+            continue
+        parent['file_count'] -= node['total_files']
+        parent['size'] -= node['total_size']
+        parent['children'].append(node)
+
+    def finish(node):
+        node_depth = node.pop('_depth')
+        node['has_children'] = bool(node['children'])
+        if max_depth is not None and node_depth >= max_depth:
+            # Cut off here; the client fetches deeper levels with ?root=
+            node['children'] = []
+        node['children'] = sorted((finish(child) for child in node['children']),
+                                  key=lambda child: child['name'].lower())
+        return node
+
+    return sorted((finish(node) for node in top), key=lambda node: node['name'].lower())
+
+
+def get_folder_tree(folders, root=None, depth=None):
+    """Cached ``build_tree``; the key changes with every invalidation."""
+    key = f'files:folder-tree:{tree_version()}:{root.pk if root else ""}:{depth}'
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree(folders, root, depth)
+        cache.set(key, tree, getattr(settings, 'FILES_TREE_CACHE_TIMEOUT', 30))
+    return tree
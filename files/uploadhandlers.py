@@ -0,0 +1,142 @@
+import hashlib
+import mimetypes
+import os
+
+from django.core.files import File as DjangoFile
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+# How much of the start of a file is kept for content type sniffing
+SNIFF_BYTES = 2048
+
+# Leading bytes of the formats HR documents come in
+MAGIC_NUMBERS = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'{\\rtf', 'application/rtf'),
+    (b'\x1f\x8b', 'application/gzip'),
+]
+# "BM" alone is too common at the start of text files; also require one of
+# the known DIB header sizes (little-endian uint32 at offset 14)
+BMP_DIB_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+# Containers whose exact type (docx/xlsx/odt..., or legacy doc/xls) depends on the name
+CONTAINER_MAGIC = [
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+]
+
+
+def sniff_content_type(head, filename):
+    """Content type from the first bytes of a file, falling back to its name."""
+    guessed, _ = mimetypes.guess_type(filename)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:2] == b'BM' and (guessed == 'image/bmp'
+                              or int.from_bytes(head[14:18], 'little') in BMP_DIB_HEADER_SIZES):
+        return 'image/bmp'
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    for magic, content_type in CONTAINER_MAGIC:
+        if head.startswith(magic):
+            return guessed or content_type
+    if guessed:
+        return guessed
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError:
+        return 'application/octet-stream'
+    return 'text/plain' if head else 'application/octet-stream'
+
+
+class DigestingUploadHandlerMixin:
+    """Computes SHA-256 and MD5 and keeps the first bytes of each file as it streams in.
+
+    The finished upload gets ``sha256``, ``md5`` and ``sniffed_content_type``
+    attributes, so nothing has to read the file again to describe it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Set up before super(): it raises StopFutureHandlers once activated
+        self.sha256 = hashlib.sha256()
+        self.md5 = hashlib.md5()
+        self.head = b''
+        super().new_file(*args, **kwargs)
+
+    def update_digests(self, raw_data):
+        self.sha256.update(raw_data)
+        self.md5.update(raw_data)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+
+    def describe(self, uploaded):
+        uploaded.sha256 = self.sha256.hexdigest()
+        uploaded.md5 = self.md5.hexdigest()
+        uploaded.sniffed_content_type = sniff_content_type(self.head, self.file_name or '')
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(DigestingUploadHandlerMixin, MemoryFileUploadHandler):
+    """In-memory upload handler that also hashes and sniffs the file as it streams in."""
+
+    def receive_data_chunk(self, raw_data, start):
+        # When not activated the chunk is passed on to the next handler instead
+        if self.activated:
+            self.update_digests(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            self.describe(uploaded)
+        return uploaded
+
+
+class HashingTemporaryFileUploadHandler(DigestingUploadHandlerMixin, TemporaryFileUploadHandler):
+    """Temporary-file upload handler that also hashes and sniffs the file as it streams in."""
+
+    def receive_data_chunk(self, raw_data, start):
+        self.update_digests(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        return self.describe(super().file_complete(file_size))
+
+
+def describe_content(content, filename):
+    """Return ``(sha256, md5, content_type)`` of ``content``.
+
+    Reuses what the upload handlers computed; otherwise reads the content once
+    and leaves the results on it for later callers (see content_sha256).
+    """
+    if not all(getattr(content, attr, None) for attr in ('sha256', 'md5', 'sniffed_content_type')):
+        wrapped = content if hasattr(content, 'chunks') else DjangoFile(content)
+        sha256, md5, head = hashlib.sha256(), hashlib.md5(), b''
+        for chunk in wrapped.chunks():
+            sha256.update(chunk)
+            md5.update(chunk)
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+        wrapped.seek(0)
+        content.sha256 = sha256.hexdigest()
+        content.md5 = md5.hexdigest()
+        content.sniffed_content_type = sniff_content_type(head, os.path.basename(filename or ''))
+    return content.sha256, content.md5, content.sniffed_content_type
+
+
+def content_sha256(content):
+    """Return the SHA-256 of ``content``, reusing the digest computed during upload if any."""
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    if not hasattr(content, 'chunks'):
+        content = DjangoFile(content)
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
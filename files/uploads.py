@@ -0,0 +1,150 @@
+"""Backends for resumable chunked uploads (see FileViewSet upload session actions)."""
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.core.files.base import ContentFile
+from django.db import transaction
+from storages.utils import clean_name
+
+from .models import Blob, File
+from .uploadhandlers import describe_content
+
+# S3 rejects parts smaller than 5 MiB (except the last) and more than 10000 parts
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+
+def session_chunk_size(total_size):
+    """Chunk size for an upload of ``total_size`` bytes, grown so it fits in MAX_PARTS parts."""
+    chunk_size = max(getattr(settings, 'FILES_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024), MIN_PART_SIZE)
+    needed = math.ceil(total_size / MAX_PARTS)
+    if needed > chunk_size:
+        # Round up to a whole MiB
+        chunk_size = math.ceil(needed / (1024 * 1024)) * 1024 * 1024
+    return chunk_size
+
+
+class MultipartUploadBackend:
+    """Chunks go straight into S3 multipart parts; nothing is kept beyond the chunk in flight."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.client = storage.connection.meta.client
+
+    def _params(self, session):
+        return {
+            'Bucket': self.storage.bucket_name,
+            'Key': self.storage._normalize_name(clean_name(session.storage_name)),
+        }
+
+    def start(self, session):
+        # Same ContentType/ACL/Content-Disposition a regular upload would get
+        write_params = self.storage._get_write_parameters(
+            session.storage_name, ContentFile(b'', name=session.name))
+        response = self.client.create_multipart_upload(**self._params(session), **write_params)
+        return response['UploadId']
+
+    def put_part(self, session, part_number, data):
+        response = self.client.upload_part(
+            **self._params(session), UploadId=session.upload_id, PartNumber=part_number, Body=data)
+        return response['ETag']
+
+    def complete(self, session):
+        """Assemble the parts; returns ``(storage_name, sha256, etag)``.
+
+        The hash is not known here (hashlib state cannot be carried from one
+        part request to the next), so it is left empty and hash_upload fills it
+        in afterwards. The ETag is the one S3 gives the assembled object.
+        """
+        parts = sorted(session.parts, key=lambda part: part['PartNumber'])
+        response = self.client.complete_multipart_upload(
+            **self._params(session), UploadId=session.upload_id, MultipartUpload={'Parts': parts})
+        return session.storage_name, '', response.get('ETag', '').strip('"')
+
+    def abort(self, session):
+        self.client.abort_multipart_upload(**self._params(session), UploadId=session.upload_id)
+
+
+class StagedUploadBackend:
+    """Fallback for storages without multipart uploads (local FileSystemStorage).
+
+    Chunks are staged as part files on local disk and written to the storage
+    in one pass on completion.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def _staging_dir(self, session):
+        base = getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None) or tempfile.gettempdir()
+        return os.path.join(base, 'hr_upload_sessions', str(session.pk))
+
+    def _part_path(self, session, part_number, etag=''):
+        # Keyed by content too, so a concurrent PUT of other bytes for the same
+        # part cannot replace the one that was recorded
+        suffix = f'-{etag}' if etag else ''
+        return os.path.join(self._staging_dir(session), f'part-{part_number:05d}{suffix}')
+
+    def start(self, session):
+        os.makedirs(self._staging_dir(session), exist_ok=True)
+        return ''
+
+    def put_part(self, session, part_number, data):
+        etag = hashlib.md5(data).hexdigest()
+        fd, tmp_path = tempfile.mkstemp(dir=self._staging_dir(session))
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_path, self._part_path(session, part_number, etag))
+        return etag
+
+    def complete(self, session):
+        hasher = hashlib.sha256()
+        md5 = hashlib.md5()
+        with tempfile.TemporaryFile() as assembled:
+            for part in sorted(session.parts, key=lambda part: part['PartNumber']):
+                with open(self._part_path(session, part['PartNumber'], part['ETag']), 'rb') as handle:
+                    for chunk in iter(lambda: handle.read(1024 * 1024), b''):
+                        hasher.update(chunk)
+                        md5.update(chunk)
+                        assembled.write(chunk)
+            assembled.seek(0)
+            name = self.storage.save(session.storage_name, DjangoFile(assembled, name=session.name))
+        self.abort(session)
+        return name, hasher.hexdigest(), md5.hexdigest()
+
+    def abort(self, session):
+        shutil.rmtree(self._staging_dir(session), ignore_errors=True)
+
+
+def hash_upload(file_id):
+    """Hash a file completed from multipart parts and register it as a blob.
+
+    Run in the background after completion: one read of the stored object gives
+    the SHA-256 used for deduplication and the strong ETag, and adopting it
+    queues its thumbnails. Identical content already stored is referenced
+    instead and this copy is purged.
+    """
+    file_obj = File.all_objects.filter(pk=file_id, blob__isnull=True).exclude(file='').first()
+    if file_obj is None:
+        return
+    name = file_obj.file.name
+    with file_obj.file.open('rb') as handle:
+        sha256, _, _ = describe_content(handle, name)
+
+    with transaction.atomic():
+        # Skip rows deleted or given other content meanwhile
+        if not File.all_objects.select_for_update().filter(pk=file_id, blob__isnull=True, file=name).exists():
+            return
+        blob, _ = Blob.objects.adopt(name, sha256, file_obj.size)
+        File.all_objects.filter(pk=file_id).update(blob=blob, file=blob.file.name, sha256=sha256)
+
+
+def get_upload_backend(storage):
+    if hasattr(storage, 'bucket_name') and hasattr(storage, 'connection'):
+        return MultipartUploadBackend(storage)
+    return StagedUploadBackend(storage)
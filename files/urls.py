@@ -1,11 +1,12 @@
 # urls.py
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import FileViewSet, FolderViewSet
+from .views import ExportJobViewSet, FileViewSet, FolderViewSet
 
 router = DefaultRouter()
 router.register(r'files', FileViewSet, basename='file')
 router.register(r'folders', FolderViewSet, basename='folder')
+router.register(r'exports', ExportJobViewSet, basename='export')
 
 urlpatterns = [
     path('upload/', FileViewSet.as_view({'post': 'upload'}), name='file-upload'),
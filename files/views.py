@@ -2,27 +2,84 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.http import FileResponse, Http404
-from rest_framework.parsers import MultiPartParser, FormParser
-from .models import File, Folder
-from .serializers import FileSerializer, FolderSerializer
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from .models import Blob, ExportJob, File, Folder, UploadSession
+from .serializers import ExportJobSerializer, FileSerializer, FolderSerializer, UploadSessionSerializer
+from .uploads import get_upload_backend, hash_upload, session_chunk_size
+from .uploadhandlers import SNIFF_BYTES, describe_content, sniff_content_type
 from .permissions import IsHR
+from .zipstream import iter_zip
+from .exports import build_export, manifest_key, release_archives, resolve_entries
+from hr_intranet.background import run_in_background
+from .trash import purge_after
+from .thumbnails import can_thumbnail, generate_thumbnails, pick_size, thumbnail_name
+from .tree import get_folder_tree, invalidate_folder_tree, tree_etag, tree_version
+from .delivery import (
+    RangeNotSatisfiable,
+    content_disposition,
+    file_etag,
+    file_last_modified,
+    if_range_matches,
+    iter_file_range,
+    offload_response,
+    parse_range,
+    set_validators,
+)
 from rest_framework.permissions import IsAuthenticated
+from hr_intranet.pagination import CreatedAtCursorPagination, DeletedAtCursorPagination, UploadDateCursorPagination
+from django.conf import settings
+from django.urls import reverse
 from django.db import transaction
+import hashlib
+import logging
 import os
+import re
+from functools import partial
 from django.db.models import Q
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+
+def target_folder(request, key):
+    """The live folder named by ``request.data[key]``; None (the top level) when empty."""
+    folder_id = request.data.get(key)
+    if folder_id in (None, ''):
+        return None
+    return Folder.objects.get(pk=int(folder_id))
+
+
+def trash_listing(view, request, serializer_class):
+    """Cursor-paginated trash listing, ordered by deletion time instead of the viewset's ordering."""
+    paginator = DeletedAtCursorPagination()
+    page = paginator.paginate_queryset(view.get_queryset(), request, view=view)
+    data = [
+        {**serializer_class(obj).data, "purge_after": purge_after(obj.deleted_at)}
+        for obj in page
+    ]
+    return paginator.get_paginated_response(data)
 
 
 class FolderViewSet(viewsets.ModelViewSet):
     serializer_class = FolderSerializer
     # Changed from IsHR to allow all authenticated users to view
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         parent_id = self.request.query_params.get("parent")
         # Always include all folders in queryset to allow deletion of nested folders
         queryset = Folder.objects.all().select_related("parent", "created_by")
 
+        if self.action in ['trash', 'restore']:
+            trashed = Folder.all_objects.filter(deleted_at__isnull=False).select_related("parent", "created_by")
+            if self.action == 'trash':
+                # Only what was deleted directly; its subfolders come back with it
+                return trashed.filter(Q(parent__isnull=True) | Q(parent__deleted_at__isnull=True))
+            return trashed
+
         # Only filter for list view
         if self.action == 'list':
             if parent_id:
@@ -31,58 +88,21 @@ class FolderViewSet(viewsets.ModelViewSet):
         return queryset
 
     def get_permissions(self):
-        if self.action in ['destroy', 'create', 'update', 'partial_update']:
+        if self.action in ['destroy', 'create', 'update', 'partial_update', 'trash', 'restore', 'move', 'copy']:
             self.permission_classes = [IsHR]
         return super().get_permissions()
 
-    @transaction.atomic
     def perform_destroy(self, instance):
-        """
-        Override perform_destroy to handle nested folder deletion within a transaction
-        """
-        try:
-            # First, get all descendant folders using recursive CTE (Common Table Expression)
-            from django.db import connection
-
-            with connection.cursor() as cursor:
-                # Find all descendant folders
-                cursor.execute("""
-                    WITH RECURSIVE folder_tree AS (
-                        -- Base case: start with the current folder
-                        SELECT id, parent_id, 1 as level
-                        FROM files_folder
-                        WHERE id = %s
-                        
-                        UNION ALL
-                        
-                        -- Recursive case: get all children
-                        SELECT f.id, f.parent_id, ft.level + 1
-                        FROM files_folder f
-                        INNER JOIN folder_tree ft ON f.parent_id = ft.id
-                    )
-                    SELECT id FROM folder_tree ORDER BY level DESC;
-                """, [instance.id])
-
-                folder_ids = [row[0] for row in cursor.fetchall()]
-
-            if not folder_ids:
-                raise Exception("Folder not found in database")
-
-            print(
-                f"Deleting folder {instance.id} and {len(folder_ids)-1} descendants")
-
-            # Delete all files in these folders
-            deleted_files = File.objects.filter(
-                folder_id__in=folder_ids).delete()
-            print(f"Deleted {deleted_files[0]} files")
-
-            # Delete folders from bottom up (already ordered by level DESC)
-            deleted_folders = Folder.objects.filter(id__in=folder_ids).delete()
-            print(f"Deleted {deleted_folders[0]} folders")
+        """Move the folder and its whole subtree to the trash.
 
-        except Exception as e:
-            print(f"Error during deletion: {str(e)}")
-            raise Exception(f"Failed to delete folder: {str(e)}")
+        Only ``deleted_at`` is set here, in one short transaction; the rows are
+        hard-deleted in batches by purge_trash once the retention period is over.
+        """
+        deleted_folders, deleted_files = instance.trash()
+        return {
+            "deleted_folders": deleted_folders,
+            "deleted_files": deleted_files,
+        }
 
     def destroy(self, request, *args, **kwargs):
         try:
@@ -100,7 +120,12 @@ class FolderViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            return super().destroy(request, *args, **kwargs)
+            counts = self.perform_destroy(folder)
+            # Restorable until purge_after; rows and storage are removed afterwards
+            return Response(
+                {**counts, "purge_after": purge_after(folder.deleted_at)},
+                status=status.HTTP_200_OK
+            )
 
         except Http404:
             return Response(
@@ -108,12 +133,134 @@ class FolderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error in destroy view: {str(e)}")
+            logger.exception("Error in destroy view")
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'])
+    def trash(self, request):
+        """Folders in the trash, most recently deleted first."""
+        return trash_listing(self, request, FolderSerializer)
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        folder = self.get_object()
+        try:
+            folder.restore()
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(FolderSerializer(folder).data)
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """Move the folder under ``parent`` (null for the top level).
+
+        The whole subtree follows in one transaction: its paths are rewritten
+        with a single UPDATE and the rollups moved between the old and new ancestors.
+        """
+        folder = self.get_object()
+        if "parent" not in request.data:
+            # A forgotten key must not send the folder to the top level
+            return Response({"error": "parent is required (null for the top level)"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = FolderSerializer(folder, data={"parent": request.data.get("parent")}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def copy(self, request, pk=None):
+        """Copy the folder and its contents under ``parent``, optionally as ``name``.
+
+        Stored content is shared with the originals, so nothing is downloaded
+        or uploaded again.
+        """
+        folder = self.get_object()
+        try:
+            parent = target_folder(request, "parent")
+            copy = folder.copy_to(parent, request.user, name=request.data.get("name"))
+        except Folder.DoesNotExist:
+            return Response({"error": "Target folder not found"}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(FolderSerializer(copy).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def browse(self, request, pk=None):
+        """Everything the folder page needs in one response, in a fixed number of queries.
+
+        The folder, its ancestors (for breadcrumbs), its subfolders, and the
+        first page of the files directly in it (?cursor= and ?page_size= page
+        through them). The ETag follows the folder tree version, which every
+        folder and file change bumps, so polling clients get a 304 without a
+        single query being run. Without a shared cache other workers only see
+        a bump once their version key expires (CACHE_VERSION_TIMEOUT).
+        """
+        etag = '"%s"' % hashlib.sha1(
+            f"{tree_version()}:{pk}:{request.query_params.urlencode()}".encode()).hexdigest()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        folder = self.get_object()
+        paginator = UploadDateCursorPagination()
+        files = paginator.paginate_queryset(
+            File.objects.filter(folder=folder).select_related("folder", "uploaded_by"), request, view=self)
+        response = Response({
+            "folder": FolderSerializer(folder).data,
+            "ancestors": list(folder.get_ancestors().values('id', 'name')),
+            "folders": FolderSerializer(
+                Folder.objects.filter(parent=folder).order_by(Lower('name'), 'id'), many=True).data,
+            "files": {
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": FileSerializer(files, many=True).data,
+            },
+        })
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='tree')
+    def tree(self, request):
+        """Whole folder tree (or the subtree under ?root=) with file counts and sizes.
+
+        ?depth= limits how many levels below the root are returned. Built from a
+        single query, cached, and answered with 304 while nothing has changed.
+        """
+        root = None
+        root_id = request.query_params.get('root')
+        depth = request.query_params.get('depth')
+        try:
+            depth = int(depth) if depth not in (None, '') else None
+            if root_id:
+                root = Folder.objects.get(pk=int(root_id))
+        except ValueError:
+            return Response({"error": "root and depth must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        except Folder.DoesNotExist:
+            return Response({"error": "Folder not found"}, status=status.HTTP_404_NOT_FOUND)
+        if depth is not None and depth < 0:
+            return Response({"error": "depth must not be negative"}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag = tree_etag(root.pk if root else None, depth)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        response = Response({
+            "root": root.pk if root else None,
+            "folders": get_folder_tree(Folder.objects.all(), root, depth),
+        })
+        response['ETag'] = etag
+        # Let clients revalidate instead of trusting a stale copy
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     @action(detail=True, methods=['patch'], url_path='rename')
     def rename(self, request, pk=None):
         folder = self.get_object()
@@ -128,34 +275,37 @@ class FolderViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'], url_path='download_zip')
     def download_zip(self, request, pk=None):
-        import io
-        import zipfile
         folder = self.get_object()
 
-        def collect_files(current_folder, path_prefix=""):
-            files = []
-            for f in current_folder.file_set.all():
-                files.append((f, os.path.join(path_prefix, f.name)))
-            for subfolder in current_folder.folder_set.all():
-                files.extend(collect_files(
-                    subfolder, os.path.join(path_prefix, subfolder.name)))
-            return files
-
-        all_files = collect_files(folder)
+        # One query for the subtree's folder names and one for its files
+        folder_names = dict(
+            folder.get_descendants(include_self=True).values_list('id', 'name'))
+
+        def relative_dir(folder_path):
+            ids = folder_path[len(folder.path):].strip('/')
+            if not ids:
+                return ""
+            return os.path.join(*[folder_names[int(pk)] for pk in ids.split('/')])
+
+        files = (
+            File.objects.filter(folder__path__startswith=folder.path)
+            .select_related('folder')
+            .order_by('folder__path', 'id')
+        )
+        all_files = [
+            (f, os.path.join(relative_dir(f.folder.path), f.name)) for f in files if f.file
+        ]
         if not all_files:
             return Response({'error': 'No files in folder or subfolders'}, status=status.HTTP_404_NOT_FOUND)
 
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-            for file_obj, arcname in all_files:
-                if file_obj.file:
-                    file_obj.file.open('rb')
-                    zip_file.writestr(arcname, file_obj.file.read())
-                    file_obj.file.close()
-        zip_buffer.seek(0)
-        response = FileResponse(
-            zip_buffer, as_attachment=True, filename=f'{folder.name}.zip')
-        response['Content-Type'] = 'application/zip'
+        # Stream the archive entry by entry instead of building it in memory:
+        # the first bytes go out immediately and memory stays constant.
+        entries = (
+            (arcname, partial(file_obj.file.open, 'rb'), file_obj.size,
+             file_obj.upload_date.timetuple()[:6], file_obj.content_type)
+            for file_obj, arcname in all_files
+        )
+        response = StreamingHttpResponse(iter_zip(entries), content_type='application/zip')
         response['Content-Disposition'] = f'attachment; filename="{folder.name}.zip"'
         # Explicit CORS headers to ensure frontend can access Content-Disposition
         try:
@@ -175,12 +325,13 @@ class FolderViewSet(viewsets.ModelViewSet):
 
 class FileViewSet(viewsets.ModelViewSet):
     serializer_class = FileSerializer
+    pagination_class = UploadDateCursorPagination
     parser_classes = [MultiPartParser, FormParser]
 
     def get_permissions(self):
-        if self.action in ["update", "partial_update", "destroy", "create"]:
+        if self.action in ["update", "partial_update", "destroy", "create", "trash", "restore", "move", "copy"]:
             self.permission_classes = [IsHR]
-        elif self.action in ["list", "retrieve", "download"]:
+        elif self.action in ["list", "retrieve", "download", "thumbnail"]:
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
@@ -188,21 +339,75 @@ class FileViewSet(viewsets.ModelViewSet):
         queryset = File.objects.select_related("folder", "uploaded_by")
         folder_id = self.request.query_params.get("folder")
 
-        # For destructive, retrieve, and download actions, always return all files
-        if self.action in ["destroy", "retrieve", "download"]:
+        if self.action in ["trash", "restore"]:
+            trashed = File.all_objects.filter(deleted_at__isnull=False).select_related("folder", "uploaded_by")
+            if self.action == "trash":
+                # Files trashed with their folder are listed under that folder instead
+                return trashed.filter(Q(folder__isnull=True) | Q(folder__deleted_at__isnull=True))
+            return trashed
+
+        # For destructive, retrieve, download and thumbnail actions, always return all files
+        if self.action in ["destroy", "retrieve", "download", "thumbnail", "move", "copy"]:
             return queryset
 
         if folder_id:
-            # Get files in this folder and all its subfolders
-            folder_ids = [folder_id]
-            # Recursively get all subfolder IDs
-            subfolders = Folder.objects.filter(parent_id=folder_id)
-            while subfolders.exists():
-                folder_ids.extend(subfolders.values_list('id', flat=True))
-                subfolders = Folder.objects.filter(parent__in=subfolders)
-            return queryset.filter(folder_id__in=folder_ids)
+            # Get files in this folder and all its subfolders via the folder path index
+            folder_path = Folder.objects.filter(
+                pk=folder_id).values_list('path', flat=True).first()
+            if not folder_path:
+                return queryset.none()
+            return queryset.filter(folder__path__startswith=folder_path)
         return queryset.filter(folder__isnull=True)
 
+    def destroy(self, request, *args, **kwargs):
+        file_obj = self.get_object()
+        file_obj.trash()
+        # Restorable until purge_after; the row and stored object are removed afterwards
+        return Response(
+            {"deleted_files": 1, "purge_after": purge_after(file_obj.deleted_at)},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['get'])
+    def trash(self, request):
+        """Files in the trash, most recently deleted first."""
+        return trash_listing(self, request, FileSerializer)
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        file_obj = self.get_object()
+        try:
+            file_obj.restore()
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(FileSerializer(file_obj).data)
+
+    @action(detail=True, methods=['post'], parser_classes=[JSONParser, FormParser])
+    def move(self, request, pk=None):
+        """Move the file into ``folder`` (null for the top level)."""
+        file_obj = self.get_object()
+        if "folder" not in request.data:
+            return Response({"error": "folder is required (null for the top level)"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_obj.folder = target_folder(request, "folder")
+        except (Folder.DoesNotExist, ValueError):
+            return Response({"error": "Target folder not found"}, status=status.HTTP_404_NOT_FOUND)
+        # save() moves the size and count between the folders' rollups
+        file_obj.save()
+        return Response(FileSerializer(file_obj).data)
+
+    @action(detail=True, methods=['post'], parser_classes=[JSONParser, FormParser])
+    def copy(self, request, pk=None):
+        """Copy the file into ``folder``, optionally as ``name``, sharing its stored content."""
+        file_obj = self.get_object()
+        try:
+            folder = target_folder(request, "folder")
+        except (Folder.DoesNotExist, ValueError):
+            return Response({"error": "Target folder not found"}, status=status.HTTP_404_NOT_FOUND)
+        copy = file_obj.copy_to(folder, request.user, name=request.data.get("name"))
+        return Response(FileSerializer(copy).data, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
     def upload(self, request):
         if not request.user.is_hr:
@@ -211,7 +416,6 @@ class FileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        folder_id = request.data.get("folder")
         files = request.FILES.getlist("files")
 
         if not files:
@@ -219,19 +423,257 @@ class FileViewSet(viewsets.ModelViewSet):
                 {"error": "No files provided"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        created_files = []
-        for file in files:
-            file_obj = File.objects.create(
-                name=os.path.basename(file.name),
-                file=file,
+        try:
+            folder = target_folder(request, "folder")
+        except (Folder.DoesNotExist, ValueError):
+            # Trashed folders are not targets: their files would be purged with them
+            return Response({"error": "Target folder not found"}, status=status.HTTP_404_NOT_FOUND)
+        folder_id = folder.pk if folder else None
+
+        # Storage writes run in a bounded thread pool; rows go in with one bulk_create
+        uploads = [(file, os.path.basename(file.name)) for file in files]
+        # Hashes and sniffed types come from the upload handlers; this only
+        # reads files that arrived without them
+        described = [describe_content(file, name) for file, name in uploads]
+        results = Blob.objects.ingest_many(
+            uploads, max_workers=getattr(settings, 'FILES_UPLOAD_WORKERS', 8))
+
+        rows = []
+        report = []
+        for (file, name), (_, md5, content_type), result in zip(uploads, described, results):
+            if isinstance(result, Exception):
+                logger.error("Failed to store upload %s", name, exc_info=result)
+                report.append({"name": name, "error": str(result)})
+                continue
+            blob, created = result
+            file_obj = File(
+                name=name,
+                file=blob.file.name,
+                blob=blob,
+                sha256=blob.sha256,
                 folder_id=folder_id,
                 uploaded_by=request.user,
                 size=file.size,
+                content_type=content_type,
+                etag=md5,
+                original_filename=name,
+            )
+            # True when identical content was already stored and no new object was written
+            file_obj.deduplicated = not created
+            rows.append(file_obj)
+            report.append(file_obj)
+
+        try:
+            with transaction.atomic():
+                File.objects.bulk_create(rows)
+                # bulk_create skips File.save, so update the folder rollups here
+                Folder.objects.update_rollups([(folder_id, len(rows), sum(row.size for row in rows))])
+                invalidate_folder_tree()
+        except Exception:
+            Blob.objects.release([row.blob_id for row in rows])
+            raise
+
+        created_files = [
+            {**FileSerializer(item).data, "deduplicated": item.deduplicated}
+            if isinstance(item, File) else item
+            for item in report
+        ]
+        failed = len(report) - len(rows)
+        return Response(
+            created_files,
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED,
+        )
+
+    # --- Resumable chunked uploads -------------------------------------------------
+    # POST   uploads/                 create a session {name, size, folder}
+    # PUT    uploads/<id>/            send the chunk starting at the current offset
+    #                                 (Content-Range: bytes start-end/total)
+    # GET    uploads/<id>/            current offset, to resume after a failure
+    # DELETE uploads/<id>/            abort
+    # POST   uploads/<id>/complete/   assemble the chunks into a File
+
+    def _get_upload_session(self, request, session_id):
+        return UploadSession.objects.filter(
+            pk=session_id, uploaded_by=request.user).select_related('folder').first()
+
+    @action(detail=False, methods=['post'], url_path='uploads',
+            parser_classes=[JSONParser, FormParser, MultiPartParser])
+    def create_upload_session(self, request):
+        if not request.user.is_hr:
+            return Response({"error": "Only HR can upload files"}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        name = os.path.basename(serializer.validated_data['name'])
+        size = serializer.validated_data['size']
+
+        storage = File.file.field.storage
+        storage_name = storage.get_available_name(File.file.field.generate_filename(None, name))
+        session = UploadSession(
+            name=name,
+            folder=serializer.validated_data.get('folder'),
+            uploaded_by=request.user,
+            size=size,
+            chunk_size=session_chunk_size(size),
+            storage_name=storage_name,
+        )
+        session.upload_id = get_upload_backend(storage).start(session)
+        session.save()
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get', 'put', 'delete'],
+            url_path=r'uploads/(?P<session_id>[0-9a-f-]{36})')
+    def upload_session(self, request, session_id=None):
+        session = self._get_upload_session(request, session_id)
+        if not session:
+            return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'GET':
+            return Response(UploadSessionSerializer(session).data)
+        if session.status != 'active':
+            return Response({"error": f"Upload session is {session.status}"}, status=status.HTTP_409_CONFLICT)
+
+        backend = get_upload_backend(File.file.field.storage)
+        if request.method == 'DELETE':
+            backend.abort(session)
+            session.status = 'aborted'
+            session.save(update_fields=['status', 'updated_at'])
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        # The chunk must start at the current offset; every chunk but the last is
+        # exactly chunk_size bytes so it maps onto one multipart part
+        content_range = request.headers.get('Content-Range', '')
+        match = re.match(r'^bytes (\d+)-\d+/\d+$', content_range)
+        start = int(match.group(1)) if match else request.query_params.get('offset')
+        try:
+            start = int(start)
+        except (TypeError, ValueError):
+            return Response({"error": "Content-Range header or offset parameter required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start != session.offset:
+            return Response({"error": "Chunk does not start at the current offset", "offset": session.offset},
+                            status=status.HTTP_409_CONFLICT)
+
+        expected = min(session.chunk_size, session.size - session.offset)
+        stream = request.stream
+        # Read at most one chunk (+1 byte to detect oversized bodies) into memory
+        data = stream.read(expected + 1) if stream is not None else b''
+        if len(data) != expected:
+            return Response({"error": f"Chunk must be exactly {expected} bytes", "offset": session.offset},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # The part is sent to storage without holding the session lock, which only
+        # covers recording it. A concurrent PUT at the same offset loses below; if
+        # it replaced the part on S3 with other bytes, completing fails on the
+        # ETag mismatch rather than assembling them (staged parts are kept apart).
+        part_number = start // session.chunk_size + 1
+        etag = backend.put_part(session, part_number, data)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if session.status != 'active':
+                return Response({"error": f"Upload session is {session.status}"}, status=status.HTTP_409_CONFLICT)
+            if session.offset != start:
+                return Response({"error": "Chunk does not start at the current offset", "offset": session.offset},
+                                status=status.HTTP_409_CONFLICT)
+            session.parts = [p for p in session.parts if p['PartNumber'] != part_number]
+            session.parts.append({'PartNumber': part_number, 'ETag': etag})
+            session.offset = start + len(data)
+            update_fields = ['parts', 'offset', 'updated_at']
+            if part_number == 1:
+                session.content_type = sniff_content_type(data[:SNIFF_BYTES], session.name)
+                update_fields.append('content_type')
+            session.save(update_fields=update_fields)
+        return Response(UploadSessionSerializer(session).data)
+
+    @action(detail=False, methods=['post'],
+            url_path=r'uploads/(?P<session_id>[0-9a-f-]{36})/complete')
+    def complete_upload_session(self, request, session_id=None):
+        session = self._get_upload_session(request, session_id)
+        if not session:
+            return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.status != 'active':
+            return Response({"error": f"Upload session is {session.status}"}, status=status.HTTP_409_CONFLICT)
+        if session.offset != session.size:
+            return Response({"error": "Upload is incomplete", "offset": session.offset},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if session.folder and session.folder.deleted_at:
+            # The folder went to the trash while the chunks were uploading
+            return Response({"error": "Target folder not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        storage_name, sha256, etag = get_upload_backend(File.file.field.storage).complete(session)
+        with transaction.atomic():
+            blob, deduplicated = None, False
+            if sha256:
+                # Share the content with identical files when its hash is known
+                blob, created = Blob.objects.adopt(storage_name, sha256, session.size)
+                storage_name, deduplicated = blob.file.name, not created
+            file_obj = File.objects.create(
+                name=session.name,
+                file=storage_name,
+                folder=session.folder,
+                uploaded_by=request.user,
+                size=session.size,
+                sha256=sha256,
+                blob=blob,
+                content_type=session.content_type,
+                etag=etag,
+                original_filename=session.name,
             )
-            created_files.append(FileSerializer(file_obj).data)
+            session.status = 'completed'
+            session.file = file_obj
+            session.save(update_fields=['status', 'file', 'updated_at'])
+            if not sha256:
+                run_in_background(hash_upload, file_obj.pk)
+        return Response({**FileSerializer(file_obj).data, "deduplicated": deduplicated},
+                        status=status.HTTP_201_CREATED)
 
-        return Response(created_files, status=status.HTTP_201_CREATED)
+    @action(detail=True, methods=['get'])
+    def thumbnail(self, request, pk=None):
+        """JPEG preview of an image or PDF, ?size= pixels on its longest side.
+
+        Thumbnails are normally made in the background after upload; a missing
+        one is generated on the spot.
+        """
+        file_obj = self.get_object()
+        if not file_obj.file or not can_thumbnail(file_obj.file.name):
+            return Response({"error": "No preview available for this file"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            size = pick_size(int(request.query_params.get('size') or 256))
+        except ValueError:
+            return Response({"error": "size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The stored content never changes, so neither do its thumbnails
+        etag = f'"{file_obj.sha256 or file_obj.pk}-{size}"'
+        max_age = getattr(settings, 'FILES_THUMBNAIL_MAX_AGE', 30 * 24 * 3600)
+        cache_control = f'private, max-age={max_age}'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            not_modified['Cache-Control'] = cache_control
+            return not_modified
+
+        storage = file_obj.file.storage
+        name = thumbnail_name(file_obj.file.name, size)
+        # Opened straight away: checking exists() first would cost every
+        # request another round trip to the bucket
+        try:
+            thumbnail = storage.open(name, 'rb')
+        except FileNotFoundError:
+            try:
+                generate_thumbnails(storage, file_obj.file.name)
+            except Exception:
+                logger.exception("Thumbnail generation failed for file %s", file_obj.id)
+                return Response({"error": "No preview available for this file"}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                thumbnail = storage.open(name, 'rb')
+            except FileNotFoundError:
+                # Not generated, e.g. the original is too large
+                return Response({"error": "No preview available for this file"}, status=status.HTTP_404_NOT_FOUND)
+
+        response = FileResponse(thumbnail, content_type='image/jpeg')
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
 
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
@@ -241,16 +683,9 @@ class FileViewSet(viewsets.ModelViewSet):
         import mimetypes
         # Always force PDF headers if file extension is .pdf or content type is pdf
         file_name_lower = file_obj.file.name.lower()
-        content_type = None
-        try:
-            # Try to read any provided content_type metadata first
-            content_type = getattr(file_obj.file, "content_type", None)
-            if not content_type:
-                # If field has an underlying file object with content_type
-                content_type = getattr(getattr(file_obj.file, 'file', None), 'content_type', None)
-        except Exception:
-            content_type = None
-
+        # Sniffed at upload time; only rows that predate it (see the
+        # backfill_file_metadata command) fall back to the name
+        content_type = file_obj.content_type
         if not content_type:
             guessed, _ = mimetypes.guess_type(file_obj.file.name)
             content_type = guessed or 'application/octet-stream'
@@ -258,48 +693,77 @@ class FileViewSet(viewsets.ModelViewSet):
         is_pdf = file_name_lower.endswith('.pdf') or (content_type and content_type.startswith('application/pdf'))
         is_image = content_type and content_type.startswith('image/')
 
-        # Ensure the underlying file is opened for both local and remote storages
-        try:
+        # Answer conditional requests (If-None-Match / If-Modified-Since) from the
+        # stored hash and upload date without touching storage at all
+        etag = file_etag(file_obj)
+        last_modified = file_last_modified(file_obj)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+
+        # For PDFs and images we prefer inline viewing; other types should download
+        if is_pdf or is_image:
+            as_attachment = False
+        else:
+            as_attachment = True
+
+        # Let the storage/CDN or the front web server send the bytes when configured,
+        # so the worker does not carry the payload
+        offloaded = offload_response(
+            file_obj.file, file_obj.name, 'application/pdf' if is_pdf else content_type, as_attachment)
+        if offloaded is not None:
+            if offloaded.status_code == 200:
+                set_validators(offloaded, etag, last_modified)
+            return offloaded
+
+        byte_range = None
+        if if_range_matches(request, etag, last_modified):
             try:
-                file_obj.file.open('rb')
-            except TypeError:
-                # Some storage backends accept open() without mode
-                try:
-                    file_obj.file.open()
-                except Exception:
-                    pass
+                byte_range = parse_range(request.headers.get('Range'), file_obj.size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f'bytes */{file_obj.size}'
+                return set_validators(response, etag, last_modified)
 
-            # Determine the actual file-like object to pass to FileResponse
-            file_handle = getattr(file_obj.file, 'file', None) or file_obj.file
+        try:
+            if byte_range:
+                # Partial content: only the requested bytes are read from storage
+                start, end = byte_range
+                response = StreamingHttpResponse(
+                    iter_file_range(file_obj.file, start, end),
+                    status=status.HTTP_206_PARTIAL_CONTENT,
+                    content_type=content_type,
+                )
+                response['Content-Range'] = f'bytes {start}-{end}/{file_obj.size}'
+                response['Content-Length'] = str(end - start + 1)
+            else:
+                # Ensure the underlying file is opened for both local and remote storages
+                try:
+                    file_obj.file.open('rb')
+                except TypeError:
+                    # Some storage backends accept open() without mode
+                    try:
+                        file_obj.file.open()
+                    except Exception:
+                        pass
 
-            # Seek to start if possible
-            try:
-                file_handle.seek(0)
-            except Exception:
-                pass
+                # Determine the actual file-like object to pass to FileResponse
+                file_handle = getattr(file_obj.file, 'file', None) or file_obj.file
 
-            # For PDFs and images we prefer inline viewing; other types should download
-            if is_pdf or is_image:
-                as_attachment = False
-            else:
-                as_attachment = True
+                # Seek to start if possible
+                try:
+                    file_handle.seek(0)
+                except Exception:
+                    pass
 
-            # Use FileResponse helper to set headers correctly; filename param ensures proper Content-Disposition
-            response = FileResponse(
-                file_handle, filename=file_obj.name, as_attachment=as_attachment, content_type=content_type
-            )
+                # Use FileResponse helper to set headers correctly; filename param ensures proper Content-Disposition
+                response = FileResponse(
+                    file_handle, filename=file_obj.name, as_attachment=as_attachment, content_type=content_type
+                )
+            set_validators(response, etag, last_modified)
 
             # Add RFC5987 encoded filename* header (UTF-8) so non-ASCII filenames work in many browsers
-            try:
-                from urllib.parse import quote
-                filename_ascii = (file_obj.name.encode('ascii', 'ignore') or b'file').decode()
-                filename_star = "utf-8''" + quote(file_obj.name)
-                disposition_type = 'inline' if not as_attachment else 'attachment'
-                response['Content-Disposition'] = f"{disposition_type}; filename=\"{filename_ascii}\"; filename*=UTF-8''{quote(file_obj.name)}"
-            except Exception:
-                # Fallback to simple header
-                disposition_type = 'inline' if not as_attachment else 'attachment'
-                response['Content-Disposition'] = f'{disposition_type}; filename="{file_obj.name}"'
+            response['Content-Disposition'] = content_disposition(file_obj.name, as_attachment)
 
             # If PDF, explicitly set content type to be safe
             if is_pdf:
@@ -307,13 +771,9 @@ class FileViewSet(viewsets.ModelViewSet):
 
             # Ensure Content-Length is set when possible (helps browsers and frontend handle downloads)
             try:
-                if getattr(file_obj, 'size', None):
+                if not byte_range and getattr(file_obj, 'size', None):
                     response['Content-Length'] = str(file_obj.size)
-                    # Log size for troubleshooting
-                    try:
-                        print(f"File size for id={file_obj.id}: {file_obj.size}")
-                    except Exception:
-                        pass
+                    logger.debug("File size for id=%s: %s", file_obj.id, file_obj.size)
             except Exception:
                 pass
 
@@ -324,20 +784,94 @@ class FileViewSet(viewsets.ModelViewSet):
                     response['Access-Control-Allow-Origin'] = origin
                 else:
                     response['Access-Control-Allow-Origin'] = '*'
-                response['Access-Control-Expose-Headers'] = 'Content-Disposition'
+                response['Access-Control-Expose-Headers'] = 'Content-Disposition, Content-Range, Accept-Ranges, ETag'
                 if getattr(__import__('django.conf').conf.settings, 'CORS_ALLOW_CREDENTIALS', False):
                     response['Access-Control-Allow-Credentials'] = 'true'
             except Exception:
                 pass
 
             # Debug log header info for troubleshooting
-            try:
-                print(f"Serving file id={file_obj.id} name={file_obj.name} content_type={content_type} disposition={response['Content-Disposition']}")
-            except Exception:
-                pass
+            logger.debug("Serving file id=%s name=%s content_type=%s disposition=%s",
+                         file_obj.id, file_obj.name, content_type, response['Content-Disposition'])
 
             return response
-        except Exception as e:
+        except Exception:
             # Log and raise 404 for missing/unsupported files
-            print(f"Error serving file {file_obj.id}: {e}")
+            logger.exception("Error serving file %s", file_obj.id)
             raise Http404("Unable to open file for download")
+
+
+class ExportJobViewSet(viewsets.ModelViewSet):
+    """ZIP exports of any selection of files and folders, built in the background.
+
+    POST {"files": [...], "folders": [...], "name": "..."} answers 202 with a
+    status URL to poll; once the job is ready its archive is served from
+    download/. An export whose entries match an earlier one reuses its archive.
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(requested_by=self.request.user)
+
+    def _links(self, request, job):
+        return {
+            "status_url": request.build_absolute_uri(reverse('export-detail', args=[job.pk])),
+            "download_url": request.build_absolute_uri(reverse('export-download', args=[job.pk])),
+        }
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file_ids = serializer.validated_data.get('files', [])
+        folder_ids = serializer.validated_data.get('folders', [])
+
+        entries = resolve_entries(file_ids, folder_ids)
+        if not entries:
+            return Response({"error": "No files in the selection"}, status=status.HTTP_404_NOT_FOUND)
+        name = serializer.validated_data.get('name')
+        if not name:
+            # A single folder export is named after the folder
+            only_folder = None
+            if len(folder_ids) == 1 and not file_ids:
+                only_folder = Folder.objects.filter(pk=folder_ids[0]).first()
+            name = only_folder.name if only_folder else 'export'
+
+        job = ExportJob.objects.create(
+            requested_by=request.user,
+            name=name,
+            manifest=[[arcname, file_obj.pk] for arcname, file_obj in entries],
+            cache_key=manifest_key(entries),
+        )
+        # The archive is built (or an identical cached one picked up) after commit
+        run_in_background(build_export, job.pk)
+        return Response({**self.get_serializer(job).data, **self._links(request, job)},
+                        status=status.HTTP_202_ACCEPTED)
+
+    def perform_destroy(self, instance):
+        name = instance.archive.name
+        instance.delete()
+        if name:
+            release_archives([name])
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        return Response({**self.get_serializer(job).data, **self._links(request, job)})
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'ready' or not job.archive:
+            return Response({"error": f"Export is {job.status}", "status": job.status},
+                            status=status.HTTP_409_CONFLICT)
+        filename = f"{job.name}.zip"
+        offloaded = offload_response(job.archive, filename, 'application/zip', True)
+        if offloaded is not None:
+            return offloaded
+        response = FileResponse(job.archive.open('rb'), as_attachment=True, filename=filename,
+                                content_type='application/zip')
+        response['Content-Disposition'] = content_disposition(filename, True)
+        response['Access-Control-Expose-Headers'] = 'Content-Disposition'
+        return response
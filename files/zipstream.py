@@ -0,0 +1,132 @@
+import mimetypes
+import time
+import zipfile
+
+from django.conf import settings
+
+# Size of the reads from storage while copying an entry into the archive.
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# Entries smaller than this are stored as-is; deflate would save next to nothing
+MIN_DEFLATE_SIZE = 1024
+
+# Formats that are already compressed (PDF streams, JPEG, PNG, and the ZIP-based
+# Office formats) are stored. Deflating them burns CPU for a percent or two.
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/xml',
+    'application/rtf',
+    'application/javascript',
+    'application/postscript',
+    'application/msword',
+    'application/vnd.ms-excel',
+    'application/vnd.ms-powerpoint',
+    'application/x-ole-storage',
+    'application/x-sql',
+    'image/bmp',
+    'image/tiff',
+    'image/svg+xml',
+}
+
+
+def is_compressible(content_type, arcname=''):
+    """Whether deflating an entry of this type is worth the CPU."""
+    if not content_type or content_type == 'application/octet-stream':
+        content_type = mimetypes.guess_type(arcname)[0] or ''
+    content_type = content_type.split(';')[0].strip().lower()
+    return (
+        content_type.startswith('text/')
+        or content_type in COMPRESSIBLE_TYPES
+        or content_type.endswith('+xml')
+        or content_type.endswith('+json')
+    )
+
+
+class _ChunkBuffer:
+    """Write-only sink handed to ZipFile.
+
+    It has no tell()/seek(), so zipfile treats it as an unseekable stream and
+    writes a data descriptor after every entry instead of patching the local
+    headers afterwards. Whatever has been written is drained by the generator
+    after each chunk, so at most one chunk (plus headers) is held in memory.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries, chunk_size=ZIP_CHUNK_SIZE, compresslevel=None, cpu_budget=None):
+    """Yield a ZIP archive chunk by chunk.
+
+    ``entries`` is an iterable of ``(arcname, open_func, size, date_time,
+    content_type)`` tuples where ``open_func`` returns a readable binary file
+    object. Entries are opened lazily and closed as soon as they are written,
+    so memory use stays constant whatever the number or size of the files.
+
+    Compressible types are deflated at ``compresslevel`` until ``cpu_budget``
+    seconds of CPU have gone into compression (FILES_ZIP_COMPRESSLEVEL and
+    FILES_ZIP_CPU_BUDGET by default); everything after that is stored.
+    """
+    if compresslevel is None:
+        compresslevel = getattr(settings, 'FILES_ZIP_COMPRESSLEVEL', 6)
+    if cpu_budget is None:
+        cpu_budget = getattr(settings, 'FILES_ZIP_CPU_BUDGET', 10.0)
+    cpu_used = 0.0
+
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for arcname, open_func, size, date_time, content_type in entries:
+            info = zipfile.ZipInfo(arcname, date_time=date_time)
+            deflate = (
+                cpu_used < cpu_budget
+                and (size or 0) >= MIN_DEFLATE_SIZE
+                and is_compressible(content_type, arcname)
+            )
+            if deflate:
+                info.compress_type = zipfile.ZIP_DEFLATED
+                # ZipFile.open() takes the level from the ZipInfo (public as
+                # compress_level only from Python 3.13)
+                info._compresslevel = compresslevel
+            else:
+                info.compress_type = zipfile.ZIP_STORED
+            # The declared size only decides whether ZIP64 headers are needed;
+            # force them when we do not know it up front.
+            info.file_size = size or 0
+            source = open_func()
+            try:
+                with archive.open(info, 'w', force_zip64=not size) as dest:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        if deflate:
+                            # Only the compression itself counts against the budget
+                            started = time.thread_time()
+                            dest.write(chunk)
+                            cpu_used += time.thread_time() - started
+                        else:
+                            dest.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+            finally:
+                source.close()
+            data = buffer.drain()
+            if data:
+                yield data
+    # Central directory and end records are written on close
+    data = buffer.drain()
+    if data:
+        yield data
@@ -0,0 +1,29 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run ``func`` in a daemon thread once the current transaction commits.
+
+    Callers record their work in the database first, so anything lost with the
+    process (restart, crash) is picked up again by the matching management
+    command. Set BACKGROUND_TASKS_ENABLED=False to leave everything to those
+    commands.
+    """
+    if not getattr(settings, 'BACKGROUND_TASKS_ENABLED', True):
+        return
+
+    def target():
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Background task %s failed', getattr(func, '__name__', func))
+        finally:
+            connections.close_all()
+
+    transaction.on_commit(lambda: threading.Thread(target=target, daemon=True).start())
@@ -0,0 +1,28 @@
+"""Version keys that invalidate a whole family of cached values at once.
+
+Cached values include the version in their key; bumping it makes every one
+of them unreachable. With a shared cache (REDIS_URL) a bump is seen by every
+process. With the per-process fallback another process cannot see it, so the
+version key itself expires after CACHE_VERSION_TIMEOUT seconds; that bounds
+how long any process keeps serving (or ETag-validating) stale values.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _timeout():
+    return getattr(settings, 'CACHE_VERSION_TIMEOUT', None)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, _timeout())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, _timeout())
@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination, newest first.
+
+    DRF's cursor filters on the first ordering field only (``created_at <
+    position``) and skips rows that tie on it with a small offset, so pages
+    are served from an index instead of OFFSET plus COUNT(*) and cost the same
+    however deep they are. ``id`` only makes the order deterministic; it is
+    not part of the cursor. Clients may ask for bigger pages with ?page_size=.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class UploadDateCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-upload_date', '-id')
+
+
+class DeletedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-deleted_at', '-id')
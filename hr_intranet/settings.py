@@ -244,16 +244,41 @@ AWS_S3_SIGNATURE_VERSION = 's3v4'
 # B2 URL configuration for public bucket
 AWS_S3_CUSTOM_DOMAIN = f"{B2_BUCKET_NAME}.s3.us-east-005.backblazeb2.com"
 
+# How FileViewSet.download delivers file bytes:
+#   "proxy"     - stream them through the worker (default)
+#   "redirect"  - same as "presigned": a plain public URL would serve the headers
+#                 stored with the shared object (the first uploader's filename)
+#   "presigned" - 302 to a short-lived presigned URL with the Content-Type and
+#                 Content-Disposition signed in (falls back to proxy on local storage)
+#   "accel"     - nginx X-Accel-Redirect handoff (FileSystemStorage only); map
+#                 FILES_ACCEL_REDIRECT_PREFIX to MEDIA_ROOT as an internal location
+#   "sendfile"  - X-Sendfile handoff for Apache/lighttpd (FileSystemStorage only)
+FILES_DOWNLOAD_MODE = os.environ.get("FILES_DOWNLOAD_MODE", "proxy").lower()
+FILES_DOWNLOAD_URL_EXPIRE = int(os.environ.get("FILES_DOWNLOAD_URL_EXPIRE", "300"))
+FILES_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    "FILES_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
 # Static files configuration
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 
+# Local disk cache in front of the B2 media bucket: set a directory to serve
+# hot documents from local disk (see storage_backends.CachedMediaStorage)
+FILES_DISK_CACHE_DIR = os.environ.get("FILES_DISK_CACHE_DIR", "")
+FILES_DISK_CACHE_MAX_SIZE = int(os.environ.get(
+    "FILES_DISK_CACHE_MAX_SIZE", str(2 * 1024 * 1024 * 1024)))
+# How long an object's ETag is trusted before asking the bucket again
+FILES_DISK_CACHE_ETAG_TTL = int(os.environ.get("FILES_DISK_CACHE_ETAG_TTL", "300"))
+
 # Configure storage to always use B2
 if not DEBUG:
     # Production / non-debug: use Backblaze B2 (S3 compatible) storage backends
     STATICFILES_STORAGE = "hr_intranet.storage_backends.StaticStorage"
-    DEFAULT_FILE_STORAGE = "hr_intranet.storage_backends.MediaStorage"
+    if FILES_DISK_CACHE_DIR:
+        DEFAULT_FILE_STORAGE = "hr_intranet.storage_backends.CachedMediaStorage"
+    else:
+        DEFAULT_FILE_STORAGE = "hr_intranet.storage_backends.MediaStorage"
 
     # URLs for B2 storage (using public bucket URLs)
     STATIC_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/static/"
@@ -271,6 +296,82 @@ else:
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# Upload handlers that also compute each file's SHA-256 while it streams in
+FILE_UPLOAD_HANDLERS = [
+    "files.uploadhandlers.HashingMemoryFileUploadHandler",
+    "files.uploadhandlers.HashingTemporaryFileUploadHandler",
+]
+
+# Chunk size for resumable uploads (FileViewSet uploads/ actions). Every chunk
+# except the last becomes one S3 multipart part, so it must be at least 5 MiB.
+FILES_UPLOAD_CHUNK_SIZE = int(os.environ.get(
+    "FILES_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+# Parallel storage writes per multi-file upload request
+FILES_UPLOAD_WORKERS = int(os.environ.get("FILES_UPLOAD_WORKERS", "8"))
+# Django rejects multipart bodies with more than 100 files by default; batches of
+# scanned documents regularly go past that
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.environ.get("DATA_UPLOAD_MAX_NUMBER_FILES", "500"))
+
+# ZIP downloads and exports deflate compressible entries (text, CSV, legacy
+# Office...) at this level, and store already-compressed ones (PDF, JPEG, DOCX).
+# Once an archive has spent FILES_ZIP_CPU_BUDGET seconds of CPU compressing,
+# its remaining entries are stored; 0 disables compression.
+FILES_ZIP_COMPRESSLEVEL = int(os.environ.get("FILES_ZIP_COMPRESSLEVEL", "6"))
+FILES_ZIP_CPU_BUDGET = float(os.environ.get("FILES_ZIP_CPU_BUDGET", "10"))
+
+# Thumbnail sizes (longest side, px) generated for uploaded images and PDFs, and
+# how long browsers may cache them (FileViewSet thumbnail action)
+FILES_THUMBNAIL_SIZES = [
+    int(size) for size in os.environ.get("FILES_THUMBNAIL_SIZES", "128,256,512").split(",") if size.strip()
+]
+FILES_THUMBNAIL_MAX_AGE = int(os.environ.get("FILES_THUMBNAIL_MAX_AGE", str(30 * 24 * 3600)))
+
+# Deleted files and folders go to the trash and can be restored for this many
+# days; the purge_trash command then removes them for good
+FILES_TRASH_RETENTION_DAYS = int(os.environ.get("FILES_TRASH_RETENTION_DAYS", "30"))
+
+# Run follow-up work (storage purges, thumbnails...) in a thread after the request commits.
+# When disabled, only the management commands (e.g. purge_storage) process it.
+BACKGROUND_TASKS_ENABLED = os.environ.get(
+    "BACKGROUND_TASKS_ENABLED", "True").lower() in ("true", "1", "yes")
+
+# Cache for computed API responses (folder tree, leave recipients...). Set
+# REDIS_URL to share it between workers (needs the redis package); otherwise
+# every process keeps its own in-memory copy and cannot see invalidations made
+# by the others, so they only take effect once CACHE_VERSION_TIMEOUT expires.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "hr-intranet",
+        }
+    }
+
+# Lifetime of the version keys that invalidate cached values (see
+# hr_intranet.cache_versions): unlimited with a shared cache, otherwise the
+# longest a worker serves data another worker has already invalidated
+CACHE_VERSION_TIMEOUT = None if REDIS_URL else int(os.environ.get("CACHE_VERSION_TIMEOUT", "30"))
+
+# Seconds a cached folder tree is served before it is rebuilt (it is also
+# invalidated whenever folders or files change)
+FILES_TREE_CACHE_TIMEOUT = int(os.environ.get(
+    "FILES_TREE_CACHE_TIMEOUT", "300" if REDIS_URL else "30"))
+
+# Seconds the HR and line manager addresses used for leave notifications are
+# cached (they are also invalidated whenever a user changes, see
+# CACHE_VERSION_TIMEOUT for how quickly other workers notice)
+LEAVES_RECIPIENTS_CACHE_TIMEOUT = int(os.environ.get(
+    "LEAVES_RECIPIENTS_CACHE_TIMEOUT", "3600" if REDIS_URL else "30"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -1,5 +1,18 @@
+import glob
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
 from django.conf import settings
+from django.core.files.base import File
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+logger = logging.getLogger(__name__)
 
 class B2PublicStorage(S3Boto3Storage):
     bucket_name = settings.AWS_STORAGE_BUCKET_NAME
@@ -12,6 +25,55 @@ class B2PublicStorage(S3Boto3Storage):
     querystring_auth = False
     use_ssl = True
 
+    def iter_range(self, name, start, end, chunk_size=64 * 1024):
+        """Stream bytes ``start``..``end`` (inclusive) of an object straight from the bucket."""
+        obj = self.bucket.Object(self._normalize_name(clean_name(name)))
+        body = obj.get(Range=f'bytes={start}-{end}')['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete_many(self, names):
+        """Delete objects with batched DeleteObjects calls (up to 1000 keys each).
+
+        Returns ``{name: error}`` for the objects that could not be deleted.
+        """
+        keys = {self._normalize_name(clean_name(name)): name for name in names}
+        items = list(keys)
+        failed = {}
+        for start in range(0, len(items), 1000):
+            response = self.connection.meta.client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in items[start:start + 1000]], 'Quiet': True},
+            )
+            for error in response.get('Errors', []):
+                failed[keys[error['Key']]] = error.get('Message') or error.get('Code', 'error')
+        return failed
+
+    def iter_keys(self, prefix=''):
+        """Yield ``(name, size, last_modified)`` for every object under ``prefix``.
+
+        Objects come in key (binary) order one ListObjectsV2 page at a time, so
+        memory use does not grow with the size of the bucket.
+        """
+        location = f'{self.location}/' if self.location else ''
+        paginator = self.connection.meta.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=location + clean_name(prefix)):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(location):], obj['Size'], obj['LastModified']
+
+    def presigned_url(self, name, expire, response_headers=None):
+        """Short-lived signed GET URL.
+
+        ``response_headers`` (``ResponseContentType``, ``ResponseContentDisposition``...)
+        are signed into the URL so the bucket replies with those headers.
+        """
+        params = {'Bucket': self.bucket.name, 'Key': self._normalize_name(clean_name(name))}
+        params.update(response_headers or {})
+        return self.connection.meta.client.generate_presigned_url(
+            'get_object', Params=params, ExpiresIn=expire)
+
 class StaticStorage(B2PublicStorage):
     location = 'static'
     default_acl = 'public-read'
@@ -20,3 +82,228 @@ class MediaStorage(B2PublicStorage):
     location = 'media'
     default_acl = 'public-read'
     file_overwrite = False
+
+    def _get_write_parameters(self, name, content=None):
+        # Default headers for direct bucket URLs. Objects are shared between
+        # rows with different names, so downloads sign their own overrides
+        # instead of relying on these (see files.delivery.offload_response)
+        from files.delivery import content_disposition
+
+        params = super()._get_write_parameters(name, content)
+        content_type = params.get('ContentType') or ''
+        # Anonymous temporary files have an int (the descriptor) for a name
+        content_name = getattr(content, 'name', None)
+        filename = os.path.basename(content_name if isinstance(content_name, str) else name)
+        inline = content_type.startswith('application/pdf') or content_type.startswith('image/')
+        params.setdefault('ContentDisposition', content_disposition(filename, not inline))
+        return params
+
+
+class CachedMediaStorage(MediaStorage):
+    """MediaStorage with a size-bounded local disk cache for reads.
+
+    Objects are cached under FILES_DISK_CACHE_DIR keyed by name and ETag, so a
+    replaced object is never served stale. The ETag (from a HEAD request) is
+    remembered for FILES_DISK_CACHE_ETAG_TTL seconds, letting repeated reads
+    of a hot document skip the network entirely. Entries are filled through a
+    temporary file and renamed into place, so readers never see partial
+    files, and the least recently used ones are evicted once the cache grows
+    past FILES_DISK_CACHE_MAX_SIZE bytes.
+    """
+    # Process-wide counters, see stats()
+    _stats_lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+
+    def __init__(self, **settings_overrides):
+        super().__init__(**settings_overrides)
+        self.cache_dir = getattr(settings, 'FILES_DISK_CACHE_DIR', '')
+        self.cache_max_size = getattr(settings, 'FILES_DISK_CACHE_MAX_SIZE', 2 * 1024 ** 3)
+        self.etag_ttl = getattr(settings, 'FILES_DISK_CACHE_ETAG_TTL', 300)
+        self._etags = OrderedDict()
+        self._etags_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._filling = set()
+        self._filling_lock = threading.Lock()
+
+    @classmethod
+    def _count(cls, counter, amount=1):
+        with cls._stats_lock:
+            setattr(cls, counter, getattr(cls, counter) + amount)
+
+    @classmethod
+    def stats(cls):
+        with cls._stats_lock:
+            return {'hits': cls._hits, 'misses': cls._misses, 'evictions': cls._evictions}
+
+    def _entry_prefix(self, name):
+        digest = hashlib.sha1(clean_name(name).encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _head(self, name):
+        """``(etag, size)`` of an object, remembered for a little while."""
+        now = time.monotonic()
+        with self._etags_lock:
+            cached = self._etags.get(name)
+            if cached and cached[0] > now:
+                self._etags.move_to_end(name)
+                return cached[1]
+        obj = self.bucket.Object(self._normalize_name(clean_name(name)))
+        value = (obj.e_tag.strip('"'), obj.content_length)
+        with self._etags_lock:
+            self._etags[name] = (now + self.etag_ttl, value)
+            while len(self._etags) > 10000:
+                self._etags.popitem(last=False)
+        return value
+
+    def _cached_path(self, name, wait=True):
+        """Path of the local copy of ``name``, filling the cache on a miss.
+
+        Returns None when the object is not cached and should not be (too big).
+        With ``wait=False`` a miss also returns None and the copy is made in a
+        background thread, for callers that only need part of the object now.
+        """
+        etag, size = self._head(name)
+        path = f'{self._entry_prefix(name)}-{etag}'
+        if os.path.exists(path):
+            self._count('_hits')
+            # mtime doubles as the LRU clock
+            os.utime(path)
+            return path
+        self._count('_misses')
+        if size > self.cache_max_size // 4:
+            return None
+        if not wait:
+            self._fill_in_background(name, path)
+            return None
+        self._fill(name, path)
+        return path
+
+    def _fill(self, name, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.fill-')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                self.bucket.Object(self._normalize_name(clean_name(name))).download_fileobj(handle)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        # Copies of a previous version of the object are dead weight now
+        for stale in glob.glob(f'{self._entry_prefix(name)}-*'):
+            if stale != path:
+                try:
+                    os.unlink(stale)
+                except FileNotFoundError:
+                    pass
+        self._evict()
+
+    def _fill_in_background(self, name, path):
+        with self._filling_lock:
+            if path in self._filling:
+                return  # a fill of this version is already running
+            self._filling.add(path)
+
+        def fill():
+            try:
+                self._fill(name, path)
+            except Exception:
+                logger.exception('Could not fill the disk cache for %s', name)
+            finally:
+                with self._filling_lock:
+                    self._filling.discard(path)
+
+        threading.Thread(target=fill, daemon=True).start()
+
+    def _evict(self):
+        if not self._evict_lock.acquire(blocking=False):
+            return  # another thread is already evicting
+        try:
+            entries = []
+            total = 0
+            for path in glob.glob(os.path.join(self.cache_dir, '*', '*')):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self.cache_max_size:
+                return
+            # Oldest first, down to 90% so every fill does not trigger another pass
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.cache_max_size * 0.9:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            self._count('_evictions', evicted)
+        finally:
+            self._evict_lock.release()
+
+    def _discard(self, name):
+        with self._etags_lock:
+            self._etags.pop(name, None)
+        for path in glob.glob(f'{self._entry_prefix(name)}-*'):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _open(self, name, mode='rb'):
+        if not self.cache_dir or 'w' in mode:
+            return super()._open(name, mode)
+        try:
+            path = self._cached_path(name)
+        except Exception:
+            logger.exception('Disk cache unavailable for %s, reading from the bucket', name)
+            path = None
+        if path is not None:
+            try:
+                return File(open(path, mode), name)
+            except FileNotFoundError:
+                # Evicted since it was looked up
+                pass
+        return super()._open(name, mode)
+
+    def iter_range(self, name, start, end, chunk_size=64 * 1024):
+        handle = None
+        if self.cache_dir:
+            try:
+                # A miss streams just the range from the bucket while the whole
+                # object is cached in the background for the next request
+                path = self._cached_path(name, wait=False)
+                handle = open(path, 'rb') if path else None
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logger.exception('Disk cache unavailable for %s, reading from the bucket', name)
+        if handle is None:
+            yield from super().iter_range(name, start, end, chunk_size)
+            return
+        with handle:
+            handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = handle.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, name):
+        super().delete(name)
+        if self.cache_dir:
+            self._discard(name)
+
+    def delete_many(self, names):
+        failed = super().delete_many(names)
+        if self.cache_dir:
+            for name in names:
+                self._discard(name)
+        return failed
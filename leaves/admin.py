@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import LeaveRequest
+from .models import DigestEntry, LeaveRequest, OutboxEmail
 
 
 class LeaveRequestAdmin(admin.ModelAdmin):
@@ -23,4 +23,27 @@ class LeaveRequestAdmin(admin.ModelAdmin):
     reject_requests.short_description = 'Reject selected leave requests'
 
 
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'to', 'last_error')
+    readonly_fields = ('leave', 'created_at', 'updated_at', 'sent_at', 'claim')
+    actions = ['retry_emails']
+
+    def retry_emails(self, request, queryset):
+        """Queue the selected failed emails again."""
+        updated = queryset.filter(status='failed').update(status='pending', attempts=0)
+        self.message_user(request, f"{updated} email(s) queued again.")
+    retry_emails.short_description = 'Retry selected failed emails'
+
+
+class DigestEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'leave', 'event', 'actor', 'created_at', 'sent_at')
+    list_filter = ('event', 'sent_at')
+    search_fields = ('recipient__username', 'recipient__email')
+    readonly_fields = ('created_at',)
+
+
 admin.site.register(LeaveRequest, LeaveRequestAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
+admin.site.register(DigestEntry, DigestEntryAdmin)
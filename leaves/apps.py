@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class LeavesConfig(AppConfig):
+    name = 'leaves'
+
+    def ready(self):
+        # Registers the recipient cache invalidation on users.User changes
+        from . import signals  # noqa: F401
@@ -0,0 +1,74 @@
+"""Send groups of notification emails over a single mail connection."""
+import logging
+import time
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """One SMTP/SES session for every message sent inside the ``with`` block.
+
+    Opening a connection (TCP, TLS handshake, AUTH) usually costs more than
+    sending a message over it, so all messages of a leave action, or of a
+    whole outbox batch, share one. Seconds spent connecting, sending and
+    closing are kept in ``timings`` and logged on exit.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection(fail_silently=False)
+        self.timings = {'connect': 0.0, 'send': 0.0, 'close': 0.0}
+        self.sent = 0
+
+    def __enter__(self):
+        started = time.perf_counter()
+        try:
+            self.connection.open()
+        finally:
+            self.timings['connect'] += time.perf_counter() - started
+        return self
+
+    def __exit__(self, *exc_info):
+        started = time.perf_counter()
+        try:
+            self.connection.close()
+        except Exception:
+            logger.exception('Failed to close the email connection')
+        self.timings['close'] += time.perf_counter() - started
+        logger.info('Sent %s email(s): connect %.3fs, send %.3fs, close %.3fs',
+                    self.sent, self.timings['connect'], self.timings['send'], self.timings['close'])
+
+    def send_messages(self, messages):
+        """Send ``messages`` in one call on the open connection; raises on failure."""
+        started = time.perf_counter()
+        try:
+            for message in messages:
+                message.connection = self.connection
+            sent = self.connection.send_messages(list(messages)) or 0
+        finally:
+            self.timings['send'] += time.perf_counter() - started
+        self.sent += sent
+        return sent
+
+    def send_each(self, messages):
+        """Send ``messages`` one by one on the open connection; returns ``{index: error}``.
+
+        Used when every message needs its own outcome (the outbox records a
+        status per email); the connection is still shared.
+        """
+        errors = {}
+        for index, message in enumerate(messages):
+            try:
+                self.send_messages([message])
+            except Exception as e:
+                errors[index] = str(e) or e.__class__.__name__
+        return errors
+
+
+def dispatch(messages):
+    """Send ``messages`` right away over one connection; returns the dispatcher for its timings."""
+    with NotificationDispatcher() as dispatcher:
+        if messages:
+            dispatcher.send_messages(messages)
+    return dispatcher
@@ -1,32 +1,29 @@
 from django.core.management.base import BaseCommand
 from leaves.models import LeaveRequest
-from django.contrib.auth import get_user_model
+from leaves.recipients import recipients_for
 
-User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Print resolved email recipients for a LeaveRequest id (or latest)'
 
     def add_arguments(self, parser):
         parser.add_argument('--id', type=int, help='LeaveRequest id')
+        parser.add_argument('--pending', action='store_true', help='Every pending LeaveRequest instead')
 
     def handle(self, *args, **options):
         lr_id = options.get('id')
-        if lr_id:
-            lr = LeaveRequest.objects.filter(pk=lr_id).first()
+        if options.get('pending'):
+            leaves = list(LeaveRequest.objects.filter(status='pending'))
+        elif lr_id:
+            leaves = list(LeaveRequest.objects.filter(pk=lr_id))
         else:
-            lr = LeaveRequest.objects.order_by('-created_at').first()
+            leaves = list(LeaveRequest.objects.order_by('-created_at')[:1])
 
-        if not lr:
+        if not leaves:
             self.stdout.write('No leave requests found')
             return
 
-        recipients = []
-        manager = getattr(lr.user, 'manager', None)
-        if manager and getattr(manager, 'email', None):
-            recipients.append(manager.email)
-        hr_emails = list(User.objects.filter(is_hr=True).exclude(email__isnull=True).exclude(email__exact='').values_list('email', flat=True))
-        recipients.extend(hr_emails)
-        recipients = [e for e in dict.fromkeys(recipients) if e]
-
-        self.stdout.write(f'LeaveRequest id={lr.id} user={lr.user_id} recipients={recipients}')
+        # One batched resolution for all of them
+        recipients = recipients_for(leaves)
+        for lr in leaves:
+            self.stdout.write(f'LeaveRequest id={lr.id} user={lr.user_id} recipients={recipients[lr.pk]}')
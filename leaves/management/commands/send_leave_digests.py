@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from leaves.models import DigestEntry, OutboxEmail
+from leaves.notifications import digest_messages
+from leaves.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'Email every recipient in digest mode one summary of the leave events gathered since their last digest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['hourly', 'daily'], action='append',
+                            help='Only recipients in this mode (repeatable; default both). '
+                                 'Schedule "--mode hourly" every hour and "--mode daily" once a day.')
+
+    def handle(self, *args, **options):
+        modes = options['mode'] or ['hourly', 'daily']
+        with transaction.atomic():
+            # Every pending entry with its leave, requester, actor and recipient in one query.
+            # Entries of recipients who switched back to immediate go out with the next run.
+            entries = list(
+                DigestEntry.objects.select_for_update(of=('self',))
+                .filter(sent_at__isnull=True, recipient__leave_notifications__in=[*modes, 'immediate'])
+                .select_related('recipient', 'leave__user', 'actor')
+                .order_by('recipient_id', 'created_at', 'pk')
+            )
+            messages = digest_messages(entries)
+            queued = OutboxEmail.objects.enqueue(messages, background=False)
+            DigestEntry.objects.filter(pk__in=[entry.pk for entry in entries]).update(sent_at=timezone.now())
+        # All digests go out over one connection per outbox batch
+        sent, failed = deliver_pending() if queued else (0, 0)
+        self.stdout.write(self.style.SUCCESS(
+            f'Queued {queued} digest(s) covering {len(entries)} event(s); sent {sent}, {failed} failed'))
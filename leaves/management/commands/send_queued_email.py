@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from leaves.models import OutboxEmail
+from leaves.outbox import DELIVERY_BATCH_SIZE, MAX_ATTEMPTS, deliver_pending, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Send the notification emails waiting in the outbox (use --loop to run as a worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting once it is drained')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between polls with --loop (default 5)')
+        parser.add_argument('--batch-size', type=int, default=DELIVERY_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help='Mark an email failed after this many attempts')
+        parser.add_argument('--stale-minutes', type=int, default=15,
+                            help='Requeue emails left sending by a worker that died (default 15)')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Queue the emails that were given up on again')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            OutboxEmail.objects.filter(status='failed').update(status='pending', attempts=0)
+        while True:
+            requeued = requeue_stale(options['stale_minutes'])
+            timings = {}
+            sent, failed = deliver_pending(
+                batch_size=options['batch_size'], max_attempts=options['max_attempts'], timings=timings)
+            if sent or failed or requeued or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Sent {sent} email(s), {failed} failed; requeued {requeued}; '
+                    f'{OutboxEmail.objects.filter(status="pending").count()} pending'))
+            if timings and options['verbosity'] > 1:
+                self.stdout.write('Connect {connect:.3f}s, send {send:.3f}s, close {close:.3f}s'.format(**timings))
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
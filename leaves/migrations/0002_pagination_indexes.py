@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='leaverequest',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['-created_at', '-id'], name='leave_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='leave_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 15:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('leaves', '0003_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('created', 'Requested'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('leave', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_entries', to='leaves.leaverequest')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_digest_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='digestentry',
+            index=models.Index(fields=['sent_at', 'recipient', 'created_at'], name='digest_pending_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.utils import timezone
 
 class LeaveRequest(models.Model):
     STATUS_CHOICES = [
@@ -19,7 +21,113 @@ class LeaveRequest(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Cursor pagination of leave listings (see hr_intranet.pagination)
+            models.Index(fields=['-created_at', '-id'], name='leave_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='leave_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"LeaveRequest({self.user}, {self.start_date} -> {self.end_date}, {self.status})"
+
+
+class OutboxEmailManager(models.Manager):
+    def enqueue(self, messages, leave=None, background=True):
+        """Record ``messages`` (EmailMultiAlternatives) for delivery once the transaction commits.
+
+        Written in the caller's transaction, so a notification exists exactly
+        when the leave change it announces does. The send_queued_email worker
+        (or a background thread, see hr_intranet.background) delivers them;
+        management commands pass ``background=False`` and deliver themselves.
+        """
+        rows = []
+        for message in messages:
+            if not message.recipients():
+                continue
+            html = next((content for content, mimetype in message.alternatives if mimetype == 'text/html'), '')
+            rows.append(self.model(
+                leave=leave,
+                subject=message.subject,
+                body=message.body,
+                html_body=html,
+                from_email=message.from_email or '',
+                to=list(message.to),
+            ))
+        if not rows:
+            return 0
+        self.bulk_create(rows)
+        if background:
+            from hr_intranet.background import run_in_background
+            from .outbox import deliver_pending
+            run_in_background(deliver_pending)
+        return len(rows)
+
+
+class OutboxEmail(models.Model):
+    """A notification email waiting to be sent (see leaves.outbox)."""
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    leave = models.ForeignKey(LeaveRequest, null=True, blank=True, on_delete=models.SET_NULL, related_name='emails')
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=254, blank=True, default='')
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    # Retries back off exponentially (see leaves.outbox.retry_delay)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set by the worker that claimed the row, so two workers never send it twice
+    claim = models.CharField(max_length=32, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OutboxEmailManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            self.subject, self.body, self.from_email or None, self.to, connection=connection)
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+    def __str__(self):
+        return f"OutboxEmail({self.subject!r} -> {', '.join(self.to)}, {self.status})"
+
+
+class DigestEntry(models.Model):
+    """A leave event waiting for the next digest of a recipient in hourly or daily mode."""
+    EVENT_CHOICES = [
+        ("created", "Requested"),
+        ("approved", "Approved"),
+        ("rejected", "Rejected"),
+    ]
+
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leave_digest_entries')
+    leave = models.ForeignKey(LeaveRequest, on_delete=models.CASCADE, related_name='digest_entries')
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the entry went out in a digest (see send_leave_digests)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'recipient', 'created_at'], name='digest_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"DigestEntry({self.recipient_id}, leave {self.leave_id} {self.event})"
@@ -0,0 +1,143 @@
+"""Notification emails for leave requests, queued in the outbox rather than sent inline."""
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template import Context, engines
+
+from .models import DigestEntry, OutboxEmail
+from .recipients import leave_recipients, split_recipients
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def compiled_template(name):
+    """The parsed template behind ``name``, loaded and compiled once per process."""
+    return engines['django'].get_template(name).template
+
+
+class NotificationRenderer:
+    """Renders the text and HTML variants of a ``leaves/leave_*`` notification.
+
+    Both variants are rendered from one Context holding the base values; each
+    message only pushes what differs (recipient name, requester or not). The
+    text variant is rendered without autoescaping, so it needs no strip_tags
+    pass and keeps names like "O'Brien" and "<user@example.com>" intact.
+    """
+
+    def __init__(self, template):
+        self.text = compiled_template(f'{template}.txt')
+        self.html = compiled_template(f'{template}.html')
+
+    def render(self, context, **variant):
+        """Returns ``(text, html)``; ``context`` is a Context from base_context()."""
+        with context.push(variant):
+            context.autoescape = False
+            text = self.text.render(context)
+            context.autoescape = True
+            html = self.html.render(context)
+        return text, html
+
+
+def base_context(lr, approver=None):
+    return Context({
+        'user': lr.user,
+        'leave': lr,
+        'approver': approver,
+        'app_url': getattr(settings, 'APP_BASE_URL', 'http://localhost:3000'),
+    })
+
+
+def _message(subject, rendered, recipients):
+    text_content, html_content = rendered
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or None
+    msg = EmailMultiAlternatives(subject, text_content, from_email, recipients)
+    msg.attach_alternative(html_content, 'text/html')
+    return msg
+
+
+def created_messages(lr, recipients=None):
+    """New request: tell the manager and HR (or ``recipients`` when given)."""
+    if recipients is None:
+        recipients = leave_recipients(lr)
+    if not recipients:
+        return []
+    subject = f"Leave request: {lr.user.get_full_name() or lr.user.username} ({lr.leave_type})"
+    rendered = NotificationRenderer('leaves/leave_notification').render(base_context(lr))
+    return [_message(subject, rendered, recipients)]
+
+
+def decision_messages(lr, approver, admin_recipients=None):
+    """Approved or rejected request: inform the manager and HR, and tell the requester."""
+    decision = lr.status  # 'approved' or 'rejected'
+    renderer = NotificationRenderer(f'leaves/leave_{decision}')
+    context = base_context(lr, approver)
+    approver_name = approver.get_full_name() or approver.username
+    messages = []
+
+    if admin_recipients is None:
+        admin_recipients = leave_recipients(lr)
+    if admin_recipients:
+        subject_admin = f"Leave request of {lr.user.get_full_name() or lr.user.username} has been {decision} by {approver_name}"
+        rendered = renderer.render(context, recipient_name=', '.join(admin_recipients), for_requester=False)
+        messages.append(_message(subject_admin, rendered, admin_recipients))
+
+    if getattr(lr.user, 'email', None):
+        subject_user = 'Your Leave Request Has Been Accepted' if decision == 'approved' else 'Your Leave Request Has Been Rejected'
+        rendered = renderer.render(
+            context, recipient_name=lr.user.get_full_name() or lr.user.username, for_requester=True)
+        messages.append(_message(subject_user, rendered, [lr.user.email]))
+    return messages
+
+
+def notify(lr, event, actor=None):
+    """Queue the notifications for ``event`` ('created', 'approved' or 'rejected') on ``lr``.
+
+    Managers and HR users in a digest mode get a DigestEntry for their next
+    digest instead of an email; everyone else, and the requester, is emailed
+    through the outbox. Call inside the transaction that changes ``lr``.
+    """
+    immediate, digest = split_recipients(lr)
+    DigestEntry.objects.bulk_create([
+        DigestEntry(recipient_id=contact.id, leave=lr, event=event, actor=actor) for contact in digest
+    ])
+    if event == 'created':
+        messages = created_messages(lr, immediate)
+    else:
+        messages = decision_messages(lr, actor, immediate)
+    return queue_messages(messages, leave=lr)
+
+
+def digest_messages(entries):
+    """One summary email per recipient for ``entries`` (DigestEntry rows with leave, user and actor loaded)."""
+    renderer = NotificationRenderer('leaves/leave_digest')
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or None
+    by_recipient = {}
+    for entry in entries:
+        by_recipient.setdefault(entry.recipient_id, []).append(entry)
+
+    messages = []
+    for recipient_entries in by_recipient.values():
+        recipient = recipient_entries[0].recipient
+        if not recipient.email:
+            continue
+        text_content, html_content = renderer.render(Context({
+            'recipient': recipient,
+            'entries': recipient_entries,
+            'app_url': getattr(settings, 'APP_BASE_URL', 'http://localhost:3000'),
+        }))
+        count = len(recipient_entries)
+        subject = f"Leave digest: {count} update{'s' if count != 1 else ''}"
+        msg = EmailMultiAlternatives(subject, text_content, from_email, [recipient.email])
+        msg.attach_alternative(html_content, 'text/html')
+        messages.append(msg)
+    return messages
+
+
+def queue_messages(messages, leave=None):
+    """Put ``messages`` in the outbox; call inside the transaction that changes ``leave``."""
+    queued = OutboxEmail.objects.enqueue(messages, leave=leave)
+    logger.info('Queued %s notification email(s) for leave %s', queued, getattr(leave, 'id', None))
+    return queued
@@ -0,0 +1,92 @@
+"""Delivery of the notification emails queued in OutboxEmail."""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .dispatch import NotificationDispatcher
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+# First retry after a minute, doubling up to six hours
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 6 * 3600
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_batch(batch_size=DELIVERY_BATCH_SIZE):
+    """Mark up to ``batch_size`` due emails as sending for this worker and return them."""
+    claim = uuid.uuid4().hex
+    due = OutboxEmail.objects.filter(
+        status='pending', next_attempt_at__lte=timezone.now()
+    ).order_by('next_attempt_at', 'pk').values_list('pk', flat=True)[:batch_size]
+    # Only rows still pending are taken, so concurrent workers split the queue.
+    # update() skips auto_now: updated_at records the claim for requeue_stale
+    OutboxEmail.objects.filter(pk__in=list(due), status='pending').update(
+        status='sending', claim=claim, updated_at=timezone.now())
+    return list(OutboxEmail.objects.filter(claim=claim, status='sending').order_by('pk'))
+
+
+def requeue_stale(minutes=15):
+    """Give back emails claimed by a worker that died before finishing them."""
+    return OutboxEmail.objects.filter(
+        status='sending', updated_at__lt=timezone.now() - timedelta(minutes=minutes)
+    ).update(status='pending', claim='')
+
+
+def deliver_pending(batch_size=DELIVERY_BATCH_SIZE, max_attempts=MAX_ATTEMPTS, timings=None):
+    """Send due emails in batches over one connection each; returns ``(sent, failed)``.
+
+    Every email gets its own status: failures are retried later with backoff
+    and given up on after ``max_attempts``. Seconds spent connecting, sending
+    and closing are added to the ``timings`` dict when one is passed.
+    """
+    sent = failed = 0
+    while True:
+        emails = claim_batch(batch_size)
+        if not emails:
+            return sent, failed
+
+        errors = {}
+        try:
+            with NotificationDispatcher() as dispatcher:
+                failures = dispatcher.send_each([email.to_message() for email in emails])
+            errors = {emails[index].pk: error for index, error in failures.items()}
+            if timings is not None:
+                for step, seconds in dispatcher.timings.items():
+                    timings[step] = timings.get(step, 0.0) + seconds
+        except Exception as e:
+            # Could not connect: the whole batch is retried
+            errors = {email.pk: str(e) or e.__class__.__name__ for email in emails}
+        delivered = [email.pk for email in emails if email.pk not in errors]
+
+        now = timezone.now()
+        OutboxEmail.objects.filter(pk__in=delivered).update(
+            status='sent', sent_at=now, claim='', last_error='', updated_at=now)
+        retried = []
+        for email in emails:
+            if email.pk not in errors:
+                continue
+            email.attempts += 1
+            email.last_error = errors[email.pk]
+            email.claim = ''
+            email.updated_at = now
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+                logger.error('Giving up on email %s to %s: %s', email.pk, email.to, email.last_error)
+            else:
+                email.status = 'pending'
+                email.next_attempt_at = now + retry_delay(email.attempts)
+                logger.warning('Email %s to %s failed (attempt %s): %s',
+                               email.pk, email.to, email.attempts, email.last_error)
+            retried.append(email)
+        OutboxEmail.objects.bulk_update(retried, ['attempts', 'last_error', 'claim', 'status', 'next_attempt_at', 'updated_at'])
+        sent += len(delivered)
+        failed += len(retried)
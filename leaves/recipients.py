@@ -0,0 +1,107 @@
+"""Who gets leave notifications: the requester's line manager and every HR user.
+
+Both lookups are cached. The cache key carries a directory version that the
+users.User post_save/post_delete handlers in leaves.signals bump, so a change
+to any user (new HR member, new manager, changed email) is seen right away by
+every worker sharing the cache. Without one (no REDIS_URL) other workers only
+see it once their version key expires, after CACHE_VERSION_TIMEOUT seconds.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from hr_intranet.cache_versions import bump_version, get_version
+
+User = get_user_model()
+
+DIRECTORY_VERSION_KEY = 'leaves:recipients:version'
+
+# A notification recipient and how they want to be notified (users.User.leave_notifications)
+Contact = namedtuple('Contact', 'id email mode')
+
+
+def directory_version():
+    return get_version(DIRECTORY_VERSION_KEY)
+
+
+def invalidate_directory():
+    # After commit, so a concurrent lookup cannot cache the old rows under the new version
+    transaction.on_commit(lambda: bump_version(DIRECTORY_VERSION_KEY))
+
+
+def _timeout():
+    return getattr(settings, 'LEAVES_RECIPIENTS_CACHE_TIMEOUT', 30)
+
+
+def hr_contacts():
+    """``(id, email, leave_notifications)`` of every HR user with an email, in a stable order."""
+    key = f'leaves:recipients:{directory_version()}:hr'
+    contacts = cache.get(key)
+    if contacts is None:
+        contacts = [
+            Contact(*row) for row in
+            User.objects.filter(is_hr=True).exclude(email__isnull=True).exclude(email__exact='')
+            .order_by('pk').values_list('pk', 'email', 'leave_notifications')
+        ]
+        cache.set(key, contacts, _timeout())
+    return contacts
+
+
+def hr_emails():
+    """Email addresses of every HR user, in a stable order."""
+    return [contact.email for contact in hr_contacts()]
+
+
+def manager_contacts(user_ids):
+    """``{user_id: line manager's Contact}`` (None without one), one query for all cache misses."""
+    version = directory_version()
+    keys = {user_id: f'leaves:recipients:{version}:manager:{user_id}' for user_id in set(user_ids)}
+    cached = cache.get_many(keys.values())
+    # Users without a manager are cached as an empty tuple
+    result = {user_id: Contact(*cached[key]) if cached[key] else None
+              for user_id, key in keys.items() if key in cached}
+    missing = [user_id for user_id in keys if user_id not in result]
+    if missing:
+        rows = User.objects.filter(pk__in=missing).values_list(
+            'pk', 'manager_id', 'manager__email', 'manager__leave_notifications')
+        found = {pk: Contact(manager_id, email, mode) for pk, manager_id, email, mode in rows if email}
+        cache.set_many({keys[user_id]: tuple(found.get(user_id, ())) for user_id in missing}, _timeout())
+        result.update({user_id: found.get(user_id) for user_id in missing})
+    return result
+
+
+def manager_emails(user_ids):
+    """``{user_id: line manager's email}`` ('' without one)."""
+    return {user_id: contact.email if contact else '' for user_id, contact in manager_contacts(user_ids).items()}
+
+
+def _combine(manager, hr):
+    """Manager first, then HR; one entry per email address."""
+    contacts = {}
+    for contact in ([manager] if manager else []) + list(hr):
+        contacts.setdefault(contact.email, contact)
+    return list(contacts.values())
+
+
+def leave_recipients(lr):
+    """Manager and HR addresses for one leave request, without duplicates."""
+    return [contact.email for contact in _combine(manager_contacts([lr.user_id])[lr.user_id], hr_contacts())]
+
+
+def recipients_for(leaves):
+    """``{leave.pk: recipients}`` for many leave requests with at most two queries."""
+    leaves = list(leaves)
+    managers = manager_contacts([lr.user_id for lr in leaves])
+    hr = hr_contacts()
+    return {lr.pk: [contact.email for contact in _combine(managers[lr.user_id], hr)] for lr in leaves}
+
+
+def split_recipients(lr):
+    """``(emails, digest_contacts)``: who hears about ``lr`` now, and who in their next digest."""
+    contacts = _combine(manager_contacts([lr.user_id])[lr.user_id], hr_contacts())
+    immediate = [contact.email for contact in contacts if contact.mode == 'immediate']
+    digest = [contact for contact in contacts if contact.mode != 'immediate']
+    return immediate, digest
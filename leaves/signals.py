@@ -1,26 +1,24 @@
-from django.db.models.signals import post_save, pre_save
-import os
-from django.dispatch import receiver
 from django.conf import settings
-from django.core.mail import send_mail
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 import logging
 
+from .recipients import invalidate_directory
+
 logger = logging.getLogger(__name__)
-from django.contrib.auth import get_user_model
 
-from .models import LeaveRequest
+# Email sending is handled by the outbox (see leaves.notifications); the
+# handlers here only keep the cached recipient directory in step with users.
 
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
-import logging
 
-logger = logging.getLogger(__name__)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='leaves_user_saved')
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no recipient depends on
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_directory()
+
 
-# Email sending is now handled inline in views to ensure visible failures and avoid
-# duplicate sends from signals. This module remains imported by the app package
-# to keep signal import semantics stable; no handlers are active here.
-def notify_on_leave_request(sender, instance, created, **kwargs):
-    pass
\ No newline at end of file
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='leaves_user_deleted')
+def user_deleted(sender, instance, **kwargs):
+    invalidate_directory()
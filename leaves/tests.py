@@ -0,0 +1,336 @@
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+from django.utils.html import strip_tags
+from rest_framework.test import APIClient
+
+from .dispatch import NotificationDispatcher
+from .models import DigestEntry, LeaveRequest, OutboxEmail
+from .notifications import created_messages, decision_messages, notify
+from .outbox import claim_batch, deliver_pending, requeue_stale
+from .recipients import hr_emails, manager_emails, split_recipients
+
+User = get_user_model()
+
+
+class FlakyEmailBackend(EmailBackend):
+    """locmem backend that refuses addresses in ``bounce`` and counts opened connections."""
+    bounce = set()
+    opened = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.recipients()) & self.bounce:
+                raise ConnectionError(f'Mailbox unavailable: {", ".join(message.recipients())}')
+        return super().send_messages(messages)
+
+
+@override_settings(BACKGROUND_TASKS_ENABLED=False, EMAIL_BACKEND='leaves.tests.FlakyEmailBackend')
+class LeaveNotificationTestCase(TestCase):
+    """An HR user, a line manager and an employee reporting to them."""
+
+    def setUp(self):
+        cache.clear()
+        FlakyEmailBackend.bounce = set()
+        FlakyEmailBackend.opened = 0
+        self.hr = User.objects.create_user(username='hr', email='hr@example.com', password='x', is_hr=True)
+        self.manager = User.objects.create_user(
+            username='manager', email='manager@example.com', password='x', is_line_manager=True)
+        self.employee = User.objects.create_user(
+            username='employee', email='employee@example.com', password='x',
+            first_name='Ann', last_name='Lee', manager=self.manager)
+        self.client = APIClient()
+
+    def request_leave(self):
+        self.client.force_authenticate(self.employee)
+        response = self.client.post('/api/leaves/', {
+            'start_date': '2026-11-02', 'end_date': '2026-11-06', 'leave_type': 'Annual', 'reason': 'Trip',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return LeaveRequest.objects.get(pk=response.json()['id'])
+
+    def leave(self, status='pending'):
+        return LeaveRequest.objects.create(
+            user=self.employee, start_date=date(2026, 11, 2), end_date=date(2026, 11, 6),
+            leave_type='Annual', status=status)
+
+    def email(self, *to):
+        return EmailMultiAlternatives('Subject', 'Body', None, list(to))
+
+
+class OutboxTests(LeaveNotificationTestCase):
+    def test_request_is_queued_with_the_leave_and_sent_later(self):
+        lr = self.request_leave()
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.leave, lr)
+        self.assertEqual(queued.status, 'pending')
+        self.assertEqual(queued.to, ['manager@example.com', 'hr@example.com'])
+        # Nothing is sent while the request is being handled
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['manager@example.com', 'hr@example.com'])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'sent')
+        self.assertIsNotNone(queued.sent_at)
+
+    def test_outbox_row_is_written_in_the_leave_transaction(self):
+        self.client.force_authenticate(self.employee)
+        with mock.patch.object(OutboxEmail.objects, 'bulk_create', side_effect=DatabaseError('outbox down')):
+            with self.assertRaises(DatabaseError), self.assertLogs('django.request', 'ERROR'):
+                self.client.post('/api/leaves/', {
+                    'start_date': '2026-11-02', 'end_date': '2026-11-06', 'leave_type': 'Annual',
+                }, format='json')
+        # The leave went with the failed outbox write
+        self.assertFalse(LeaveRequest.objects.exists())
+
+    @override_settings(BACKGROUND_TASKS_ENABLED=True)
+    def test_nothing_is_sent_on_rollback(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    notify(self.leave(), 'created')
+                    raise RuntimeError('rolled back')
+        # Neither the row nor the background delivery survive the rollback
+        self.assertEqual(callbacks, [])
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.assertEqual(deliver_pending(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_failures_are_retried_with_backoff(self):
+        FlakyEmailBackend.bounce = {'bounce@example.com'}
+        OutboxEmail.objects.enqueue([self.email('ok@example.com'), self.email('bounce@example.com')])
+        self.assertEqual(deliver_pending(), (1, 1))
+
+        failed = OutboxEmail.objects.get(to=['bounce@example.com'])
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn('Mailbox unavailable', failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # Not due yet
+        self.assertEqual(deliver_pending(), (0, 0))
+
+        FlakyEmailBackend.bounce = set()
+        OutboxEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual([message.to for message in mail.outbox], [['ok@example.com'], ['bounce@example.com']])
+
+    def test_gives_up_after_max_attempts(self):
+        FlakyEmailBackend.bounce = {'bounce@example.com'}
+        OutboxEmail.objects.enqueue([self.email('bounce@example.com')])
+        deliver_pending(max_attempts=2)
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        deliver_pending(max_attempts=2)
+        self.assertEqual(OutboxEmail.objects.get().status, 'failed')
+
+    def test_claim_stamps_updated_at(self):
+        OutboxEmail.objects.enqueue([self.email('ok@example.com')])
+        OutboxEmail.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(len(claim_batch()), 1)
+        # Claimed just now: not stale, so not given back
+        self.assertEqual(requeue_stale(minutes=15), 0)
+        self.assertEqual(OutboxEmail.objects.get().status, 'sending')
+
+        OutboxEmail.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(minutes=15), 1)
+        self.assertEqual(OutboxEmail.objects.get().status, 'pending')
+
+    def test_send_queued_email_command(self):
+        OutboxEmail.objects.enqueue([self.email('ok@example.com')])
+        call_command('send_queued_email', stdout=mock.Mock())
+        self.assertEqual(len(mail.outbox), 1)
+
+        # --loop keeps polling until interrupted
+        OutboxEmail.objects.enqueue([self.email('later@example.com')])
+        with mock.patch('leaves.management.commands.send_queued_email.time.sleep',
+                        side_effect=KeyboardInterrupt) as sleep:
+            call_command('send_queued_email', '--loop', stdout=mock.Mock())
+        sleep.assert_called_once()
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class LeaveListTests(LeaveNotificationTestCase):
+    def test_cursor_pages_newest_first(self):
+        ids = [self.leave().pk for _ in range(3)]
+        self.client.force_authenticate(self.hr)
+        first = self.client.get('/api/leaves/', {'page_size': 2}).json()
+        self.assertEqual(set(first), {'next', 'previous', 'results'})
+        self.assertIsNone(first['previous'])
+        self.assertEqual([row['id'] for row in first['results']], ids[2:0:-1])
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], ids[:1])
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+
+class DispatcherTests(LeaveNotificationTestCase):
+    def test_one_leave_action_is_one_batched_send(self):
+        lr = self.leave()
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.post(f'/api/leaves/{lr.pk}/approve/').status_code, 200)
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+
+        self.assertEqual(deliver_pending(), (2, 0))
+        # Managers and HR get one email, the requester another, over one connection
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        self.assertEqual(sorted(message.to for message in mail.outbox),
+                         [['employee@example.com'], ['manager@example.com', 'hr@example.com']])
+
+    def test_failures_are_isolated_per_message(self):
+        FlakyEmailBackend.bounce = {'b@example.com'}
+        messages = [self.email('a@example.com'), self.email('b@example.com'), self.email('c@example.com')]
+        with NotificationDispatcher() as dispatcher:
+            errors = dispatcher.send_each(messages)
+        self.assertEqual(list(errors), [1])
+        self.assertEqual([message.to for message in mail.outbox], [['a@example.com'], ['c@example.com']])
+        self.assertEqual(dispatcher.sent, 2)
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        self.assertEqual(set(dispatcher.timings), {'connect', 'send', 'close'})
+
+
+class RecipientDirectoryTests(LeaveNotificationTestCase):
+    def test_lookups_are_cached(self):
+        self.assertEqual(hr_emails(), ['hr@example.com'])
+        self.assertEqual(manager_emails([self.employee.pk]), {self.employee.pk: 'manager@example.com'})
+        with self.assertNumQueries(0):
+            hr_emails()
+            manager_emails([self.employee.pk])
+
+    def test_role_change_invalidates(self):
+        hr_emails()
+        self.client.force_authenticate(self.hr)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/user/{self.manager.pk}/hr/', {'is_hr': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(hr_emails(), ['hr@example.com', 'manager@example.com'])
+
+    def test_preference_change_invalidates(self):
+        self.assertEqual(split_recipients(self.leave()), (['manager@example.com', 'hr@example.com'], []))
+        self.client.force_authenticate(self.hr)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/user/notifications/', {'leave_notifications': 'daily'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        immediate, digest = split_recipients(self.leave())
+        self.assertEqual(immediate, ['manager@example.com'])
+        self.assertEqual([(contact.email, contact.mode) for contact in digest], [('hr@example.com', 'daily')])
+
+    def test_admin_manager_assignment_invalidates(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='x', is_line_manager=True)
+        manager_emails([self.employee.pk])
+        admin = Client()
+        admin.force_login(User.objects.create_superuser(username='admin', password='x'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = admin.post(f'/admin/users/user/assign-manager/?ids={self.employee.pk}', {'manager': other.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(manager_emails([self.employee.pk]), {self.employee.pk: 'other@example.com'})
+
+    @override_settings(CACHE_VERSION_TIMEOUT=30, LEAVES_RECIPIENTS_CACHE_TIMEOUT=3600)
+    def test_unseen_changes_expire_with_the_version(self):
+        hr_emails()
+        # As if another worker made the change: this process's cache never hears of it
+        User.objects.filter(pk=self.hr.pk).update(email='new-hr@example.com')
+        self.assertEqual(hr_emails(), ['hr@example.com'])
+
+        later = time.time() + 31
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(hr_emails(), ['new-hr@example.com'])
+
+
+class NotificationRendererTests(LeaveNotificationTestCase):
+    """Compiled templates render what render_to_string did, per message."""
+
+    def legacy(self, template, **context):
+        # How messages were rendered before NotificationRenderer
+        return (strip_tags(render_to_string(f'{template}.txt', context)),
+                render_to_string(f'{template}.html', context))
+
+    def rendered(self, message):
+        return message.body, message.alternatives[0][0]
+
+    def test_created(self):
+        lr = self.leave()
+        message, = created_messages(lr, ['hr@example.com'])
+        self.assertEqual(message.subject, 'Leave request: Ann Lee (Annual)')
+        text, html = self.legacy('leaves/leave_notification', user=self.employee, leave=lr)
+        self.assertEqual(self.rendered(message)[1], html)
+        # strip_tags used to drop the "<address>" part of the text variant
+        self.assertEqual(self.rendered(message)[0],
+                         text.replace('Ann Lee \nType', 'Ann Lee <employee@example.com>\nType'))
+
+    def test_decisions(self):
+        for decision, requester_subject in (('approved', 'Your Leave Request Has Been Accepted'),
+                                            ('rejected', 'Your Leave Request Has Been Rejected')):
+            with self.subTest(decision):
+                lr = self.leave(status=decision)
+                admin, requester = decision_messages(lr, self.manager, ['hr@example.com'])
+                self.assertEqual(admin.subject, f'Leave request of Ann Lee has been {decision} by manager')
+                self.assertEqual(requester.subject, requester_subject)
+
+                context = {'user': self.employee, 'leave': lr, 'approver': self.manager}
+                self.assertEqual(self.rendered(admin), self.legacy(
+                    f'leaves/leave_{decision}', recipient_name='hr@example.com', for_requester=False, **context))
+                self.assertEqual(self.rendered(requester), self.legacy(
+                    f'leaves/leave_{decision}', recipient_name='Ann Lee', for_requester=True, **context))
+
+
+class DigestTests(LeaveNotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.hr.pk).update(leave_notifications='daily')
+
+    def test_digest_recipients_get_entries_instead_of_mail(self):
+        lr = self.request_leave()
+        entry = DigestEntry.objects.get()
+        self.assertEqual((entry.recipient, entry.leave, entry.event), (self.hr, lr, 'created'))
+        # The manager, in immediate mode, is still emailed right away
+        self.assertEqual(OutboxEmail.objects.get().to, ['manager@example.com'])
+
+    def test_decision_reaches_requester_immediately(self):
+        lr = self.leave()
+        self.client.force_authenticate(self.manager)
+        self.client.post(f'/api/leaves/{lr.pk}/reject/')
+        self.assertEqual(sorted(email.to for email in OutboxEmail.objects.all()),
+                         [['employee@example.com'], ['manager@example.com']])
+        self.assertEqual(DigestEntry.objects.get().actor, self.manager)
+
+    def test_command_sends_one_digest_and_clears_the_entries(self):
+        self.request_leave()
+        self.request_leave()
+        deliver_pending()
+        mail.outbox = []
+
+        call_command('send_leave_digests', '--mode', 'hourly', stdout=mock.Mock())
+        self.assertEqual(mail.outbox, [])
+
+        call_command('send_leave_digests', '--mode', 'daily', stdout=mock.Mock())
+        digest, = mail.outbox
+        self.assertEqual(digest.to, ['hr@example.com'])
+        self.assertEqual(digest.subject, 'Leave digest: 2 updates')
+        self.assertEqual(digest.body.count('Ann Lee: Annual'), 2)
+        self.assertFalse(DigestEntry.objects.filter(sent_at__isnull=True).exists())
+
+        call_command('send_leave_digests', stdout=mock.Mock())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_immediate_mode_is_unaffected(self):
+        User.objects.filter(pk=self.hr.pk).update(leave_notifications='immediate')
+        cache.clear()
+        self.request_leave()
+        self.assertFalse(DigestEntry.objects.exists())
+        self.assertEqual(OutboxEmail.objects.get().to, ['manager@example.com', 'hr@example.com'])
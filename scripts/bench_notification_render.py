@@ -0,0 +1,73 @@
+"""Time rendering leave notifications: per-call render_to_string + strip_tags vs NotificationRenderer.
+
+    python scripts/bench_notification_render.py [--count 1000]
+"""
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hr_intranet.settings')
+
+import django
+django.setup()
+
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+from django.contrib.auth import get_user_model
+from leaves.models import LeaveRequest
+from leaves.notifications import NotificationRenderer, base_context
+
+User = get_user_model()
+
+
+def sample(count):
+    """Unsaved requests, so nothing touches the database."""
+    approver = User(username='hr', first_name='Ada', last_name="O'Brien", email='hr@example.com')
+    for i in range(count):
+        user = User(username=f'user{i}', first_name='Employee', last_name=str(i), email=f'user{i}@example.com')
+        yield approver, LeaveRequest(
+            user=user, start_date=date(2026, 1, 5), end_date=date(2026, 1, 9), leave_type='Annual', status='approved')
+
+
+def legacy(count):
+    # What the views did before: both variants rendered from scratch for each recipient group
+    for approver, lr in sample(count):
+        for for_requester in (False, True):
+            ctx = {'user': lr.user, 'leave': lr, 'approver': approver,
+                   'recipient_name': 'hr@example.com', 'for_requester': for_requester}
+            render_to_string('leaves/leave_approved.html', ctx)
+            strip_tags(render_to_string('leaves/leave_approved.txt', ctx))
+
+
+def cached(count):
+    renderer = NotificationRenderer('leaves/leave_approved')
+    for approver, lr in sample(count):
+        context = base_context(lr, approver)
+        for for_requester in (False, True):
+            renderer.render(context, recipient_name='hr@example.com', for_requester=for_requester)
+
+
+def bench(label, func, count):
+    started = time.perf_counter()
+    func(count)
+    elapsed = time.perf_counter() - started
+    print(f'{label:<22} {elapsed * 1000:8.1f} ms  ({elapsed / count * 1e6:7.1f} us per notification)')
+    return elapsed
+
+
+if __name__ == '__main__':
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument('--count', type=int, default=1000)
+    args = p.parse_args()
+    # Warm both paths once so template loading is not counted against the first
+    legacy(1)
+    cached(1)
+    before = bench('render_to_string', legacy, args.count)
+    after = bench('NotificationRenderer', cached, args.count)
+    print(f'speedup: {before / after:.1f}x')
@@ -6,6 +6,7 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 
 from .models import User
+from leaves.recipients import invalidate_directory
 from django.contrib import admin as dj_admin
 
 
@@ -33,7 +34,7 @@ class CustomUserAdmin(UserAdmin):
     list_editable = ('manager',)
 
     # Fields that can be filtered
-    list_filter = ('is_hr', 'is_line_manager', 'is_staff', 'is_superuser', 'is_active')
+    list_filter = ('is_hr', 'is_line_manager', 'is_staff', 'is_superuser', 'is_active', 'leave_notifications')
     # Fieldsets for the edit view
     inlines = [SubordinateInline]
     fieldsets = (
@@ -42,6 +43,7 @@ class CustomUserAdmin(UserAdmin):
         ('Permissions', {
             'fields': ('is_active', 'is_staff', 'is_superuser', 'is_hr', 'is_line_manager', 'manager', 'groups', 'user_permissions'),
         }),
+        ('Notifications', {'fields': ('leave_notifications',)}),
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
     # Fieldsets for the add view
@@ -88,6 +90,8 @@ class CustomUserAdmin(UserAdmin):
             if form.is_valid():
                 manager = form.cleaned_data['manager']
                 count = users_qs.update(manager=manager)
+                # update() sends no post_save, so drop the cached leave recipients here
+                invalidate_directory()
                 self.message_user(request, f"{count} user(s) assigned to {manager}.")
                 return redirect('..')
         else:
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_manager'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='leave_notifications',
+            field=models.CharField(choices=[('immediate', 'Immediately'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', help_text='Send leave notifications one by one or gathered in a digest (see send_leave_digests)', max_length=20),
+        ),
+    ]
@@ -2,6 +2,12 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 class User(AbstractUser):
+    LEAVE_NOTIFICATION_CHOICES = [
+        ('immediate', 'Immediately'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+    ]
+
     is_hr = models.BooleanField(default=False)
     is_line_manager = models.BooleanField(default=False)
     # Optional self-referential FK: a user may have a line manager (another User)
@@ -13,6 +19,14 @@ class User(AbstractUser):
         related_name='subordinates',
         help_text='Line manager for this user (one manager for many users)'
     )
+    # How this user hears about leave requests they manage or handle as HR
+    # (their own requests are always notified immediately)
+    leave_notifications = models.CharField(
+        max_length=20,
+        choices=LEAVE_NOTIFICATION_CHOICES,
+        default='immediate',
+        help_text='Send leave notifications one by one or gathered in a digest (see send_leave_digests)'
+    )
     
     # Add these to avoid reverse accessor clashes
     groups = models.ManyToManyField(
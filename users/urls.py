@@ -9,6 +9,7 @@ from .views import (
     UserLineManagerPrivilegeView,
     UserManagerUpdateView,
     UserPasswordChangeView,
+    UserNotificationPreferenceView,
 )
 
 urlpatterns = [
@@ -21,4 +22,5 @@ urlpatterns = [
     path("create/", UserCreateView.as_view(), name="user-create"),
     path("<int:pk>/", UserDeleteView.as_view(), name="user-delete"),
     path("password/", UserPasswordChangeView.as_view(), name="user-password-change"),
+    path("notifications/", UserNotificationPreferenceView.as_view(), name="user-notification-preference"),
 ]
\ No newline at end of file
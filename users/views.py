@@ -38,6 +38,26 @@ class UserRoleView(APIView):
         })
 
 
+class UserNotificationPreferenceView(APIView):
+    """The current user's leave notification mode: immediate, hourly or daily digest."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"leave_notifications": request.user.leave_notifications})
+
+    def patch(self, request):
+        mode = request.data.get("leave_notifications")
+        choices = dict(User.LEAVE_NOTIFICATION_CHOICES)
+        if mode not in choices:
+            return Response(
+                {"detail": f"leave_notifications must be one of: {', '.join(choices)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        request.user.leave_notifications = mode
+        request.user.save(update_fields=["leave_notifications"])
+        return Response({"leave_notifications": mode})
+
+
 # List all users (admin only)
 class UserListView(generics.ListAPIView):
     queryset = User.objects.all()